@@ -1,4 +1,10 @@
 from django.contrib import admin
 from .models import CustomUser
 
-admin.site.register(CustomUser)
\ No newline at end of file
+@admin.register(CustomUser)
+class CustomUserAdmin(admin.ModelAdmin):
+    list_display = ['username', 'email', 'is_verified', 'is_staff', 'date_joined']
+    list_filter = ['is_staff', 'is_verified']
+    ordering = ['username']
+    # Backs the user autocomplete on orders and carts; prefix lookups can use the unique indexes
+    search_fields = ['username__startswith', 'email__startswith']
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from .backends import forget_unknown_user
+        post_save.connect(forget_unknown_user, sender=self.get_model('CustomUser'), dispatch_uid='accounts_forget_unknown_user')
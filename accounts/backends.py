@@ -1,15 +1,48 @@
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.crypto import salted_hmac
 from .models import CustomUser
+from .throttling import key_digest
+
+def unknown_user_key(identifier):
+    return f'auth:unknown:{key_digest(identifier)}'
+
+def rejected_password_key(user, password):
+    # Keyed on the stored hash too, so a password change invalidates it; the password itself is never stored
+    return f'auth:rejected:{salted_hmac("auth-rejected", f"{user.pk}:{user.password}:{password}").hexdigest()}'
 
 class EmailBackend(ModelBackend):
+    """Authenticate with either the email address or the username.
+
+    The user is looked up with a single query. Identifiers that match no
+    user, and password guesses that were just rejected for a user, are
+    remembered for AUTH_NEGATIVE_CACHE_TTL seconds. Repeats of either are
+    turned away without touching the database or the password hasher.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = CustomUser.objects.get(email=username)
-        except CustomUser.DoesNotExist:
-            try:
-                user = CustomUser.objects.get(username=username)
-            except CustomUser.DoesNotExist:
-                return None
-        if user.check_password(password):
-            return user
-        return None
\ No newline at end of file
+        if not username or password is None:
+            return None
+        ttl = settings.AUTH_NEGATIVE_CACHE_TTL
+        if cache.get(unknown_user_key(username)):
+            return None
+        # Prefer an email match when the identifier is someone's email and another user's username
+        users = sorted(CustomUser.objects.filter(Q(email=username) | Q(username=username))[:2],
+                       key=lambda user: user.email != username)
+        if not users:
+            cache.set(unknown_user_key(username), True, ttl)
+            return None
+        user = users[0]
+        if cache.get(rejected_password_key(user, password)):
+            return None
+        if not user.check_password(password):
+            cache.set(rejected_password_key(user, password), True, ttl)
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+def forget_unknown_user(sender, instance, created, raw=False, **kwargs):
+    # A new account must be able to log in right away even if its email was just looked up
+    if created and not raw:
+        cache.delete_many([unknown_user_key(instance.email), unknown_user_key(instance.username)])
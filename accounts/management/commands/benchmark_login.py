@@ -0,0 +1,81 @@
+import logging
+import random
+import time
+from collections import Counter
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+from accounts.models import CustomUser
+from accounts.throttling import account_failure_key
+
+PASSWORD = 'correct-horse-battery'
+OUTCOMES = {302: 'accepted', 200: 'rejected', 429: 'throttled'}
+# Limits high enough, and a negative cache short enough, to switch the defences off
+UNDEFENDED = {'LOGIN_FAILURES_PER_IP': 10 ** 9, 'LOGIN_FAILURES_PER_ACCOUNT': 10 ** 9, 'AUTH_NEGATIVE_CACHE_TTL': 0}
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = 'Measure login throughput for real users and under credential-stuffing traffic, with and without the defences.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=200, help='Login attempts per scenario.')
+        parser.add_argument('--users', type=int, default=20)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Every throttled attempt would otherwise log a warning
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        self.rng = random.Random(42)
+        self.subnet = int(time.time()) % 2 ** 16
+        try:
+            with transaction.atomic():
+                users = self.seed(options['users'])
+                self.run(users, options['attempts'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        hashed = make_password(PASSWORD)
+        return CustomUser.objects.bulk_create([
+            CustomUser(username=f'login-bench-{i}', email=f'login-bench-{i}@example.com',
+                       phone_number=f'+9198{self.rng.randrange(10 ** 7, 10 ** 8)}', password=hashed, is_verified=True)
+            for i in range(count)
+        ])
+
+    def run(self, users, attempts):
+        leaked = [f'leaked-{i}@example.com' for i in range(50)]
+        self.identifiers = [user.email for user in users] + leaked
+        scenarios = {
+            # Real users, each from their own address
+            'valid logins': lambda i: (users[i % len(users)].email, PASSWORD, i % 200),
+            # A leaked list of emails that have no account here, from a botnet
+            'unknown accounts': lambda i: (self.rng.choice(leaked), 'hunter2', i % 200),
+            # Common passwords against real accounts, from a handful of addresses
+            'password spraying': lambda i: (self.rng.choice(users).email, self.rng.choice(['123456', 'password', 'qwerty']), i % 3),
+        }
+        self.stdout.write(f'{"scenario":<20}{"defences":<10}{"logins/s":>10}  outcomes')
+        for label, attempt in scenarios.items():
+            for defended in (False, True):
+                with override_settings(**({} if defended else UNDEFENDED)):
+                    rate, outcomes = self.measure(attempt, attempts)
+                summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items()))
+                self.stdout.write(f'{label:<20}{"on" if defended else "off":<10}{rate:>10.1f}  {summary}')
+
+    def measure(self, attempt, attempts):
+        # Start each measurement from clean counters: new client addresses, account failures reset
+        self.subnet = (self.subnet + 1) % 2 ** 16
+        cache.delete_many([account_failure_key(identifier) for identifier in self.identifiers])
+        outcomes = Counter()
+        started = time.perf_counter()
+        for i in range(attempts):
+            username, password, host = attempt(i)
+            ip = f'10.{self.subnet // 256}.{self.subnet % 256}.{host}'
+            response = Client(REMOTE_ADDR=ip).post('/accounts/login/', {'username': username, 'password': password})
+            outcomes[OUTCOMES.get(response.status_code, response.status_code)] += 1
+        return attempts / (time.perf_counter() - started), outcomes
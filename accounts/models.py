@@ -6,7 +6,7 @@ class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     phone_number = PhoneNumberField(unique=True)
     is_verified = models.BooleanField(default=False)
-    verification_token = models.CharField(max_length=100, blank=True)
+    verification_token = models.CharField(max_length=100, blank=True, db_index=True)
     is_2fa_enabled = models.BooleanField(default=False)
 
 class Address(models.Model):
@@ -0,0 +1,42 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+def key_digest(value):
+    # Cache keys must stay short and free of user-supplied characters
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+def ip_failure_key(ip):
+    return f'login:fail:ip:{key_digest(ip)}'
+
+def account_failure_key(identifier):
+    return f'login:fail:account:{key_digest((identifier or "").strip().lower())}'
+
+def failure_keys(request, identifier):
+    return [ip_failure_key(client_ip(request)), account_failure_key(identifier)]
+
+def login_throttled(request, identifier):
+    """Whether this IP or this account has used up its failed-login budget.
+
+    Checked before authenticating, so throttled attempts cost one cache
+    round trip instead of a database lookup and a password hash.
+    """
+    keys = failure_keys(request, identifier)
+    counts = cache.get_many(keys)
+    ip_failures, account_failures = (counts.get(key, 0) for key in keys)
+    return ip_failures >= settings.LOGIN_FAILURES_PER_IP or account_failures >= settings.LOGIN_FAILURES_PER_ACCOUNT
+
+def record_login_failure(request, identifier):
+    for key in failure_keys(request, identifier):
+        # add() starts the window; incr() keeps its original expiry
+        if not cache.add(key, 1, settings.LOGIN_FAILURE_WINDOW):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 1, settings.LOGIN_FAILURE_WINDOW)
+
+def clear_login_failures(request, identifier):
+    cache.delete(account_failure_key(identifier))
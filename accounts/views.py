@@ -1,16 +1,16 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.urls import reverse
 from .forms import CustomUserCreationForm, TwoFactorForm
 from .models import CustomUser
-from django.core.mail import send_mail
+from .otp import discard_otp, issue_otp, verify_otp
+from .throttling import clear_login_failures, login_throttled, record_login_failure
+from shop.mail import queue_mail
+from shop.orders import order_history
 import uuid
-import random
-from django.conf import settings
-
-def send_otp(phone, otp):
-    print(f"Simulated OTP for {phone}: {otp}")
-    return True
 
 def register(request):
     if request.method == 'POST':
@@ -21,18 +21,12 @@ def register(request):
             user.verification_token = str(uuid.uuid4())
             user.save()
             verification_link = request.build_absolute_uri(f"/accounts/verify/{user.verification_token}/")
-            try:
-                send_mail(
-                    'Verify Your Email',
-                    f'Click the link to verify your email: {verification_link}',
-                    settings.EMAIL_HOST_USER,
-                    [user.email],
-                    fail_silently=False,
-                )
-                messages.success(request, 'Registration successful. Please check your email (or terminal in DEBUG mode) to verify.')
-            except Exception as e:
-                messages.error(request, f'Failed to send verification email: {str(e)}. Please try again.')
-                return redirect('register')
+            queue_mail(
+                'Verify Your Email',
+                f'Click the link to verify your email: {verification_link}',
+                [user.email],
+            )
+            messages.success(request, 'Registration successful. Please check your email (or terminal in DEBUG mode) to verify.')
             return redirect('login')
     else:
         form = CustomUserCreationForm()
@@ -58,20 +52,18 @@ def two_factor_setup(request):
     if request.method == 'POST':
         form = TwoFactorForm(request.POST)
         if form.is_valid():
-            otp = form.cleaned_data['otp']
-            stored_otp = request.session.get('otp')
-            if str(otp) == str(stored_otp):
+            user = verify_otp(request.session.get('otp_token'), form.cleaned_data['otp'], 'setup')
+            if user is not None and user.pk == request.user.pk:
                 request.user.is_2fa_enabled = True
-                request.user.save()
-                del request.session['otp']
+                request.user.save(update_fields=['is_2fa_enabled'])
+                del request.session['otp_token']
                 messages.success(request, 'Two-factor authentication enabled.')
                 return redirect('profile')
             else:
                 messages.error(request, 'Invalid OTP.')
     else:
-        otp = random.randint(100000, 999999)
-        request.session['otp'] = otp
-        send_otp(request.user.phone_number, otp)
+        discard_otp(request.session.get('otp_token'))
+        request.session['otp_token'] = issue_otp(request.user, 'setup')
         form = TwoFactorForm()
     return render(request, 'accounts/2fa_setup.html', {'form': form})
 
@@ -79,20 +71,23 @@ def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
+        if login_throttled(request, username):
+            messages.error(request, 'Too many failed login attempts. Please try again later.')
+            return render(request, 'accounts/login.html', status=429)
         user = authenticate(request, username=username, password=password)
         if user is not None:
+            clear_login_failures(request, username)
             if not user.is_verified:
                 messages.error(request, 'Please verify your email first.')
                 return redirect('login')
             if user.is_2fa_enabled:
-                otp = random.randint(100000, 999999)
-                request.session['otp'] = otp
-                send_otp(user.phone_number, otp)
-                request.session['user_id'] = user.id
+                discard_otp(request.session.get('otp_token'))
+                request.session['otp_token'] = issue_otp(user, 'login')
                 return redirect('2fa_verify')
             login(request, user)
             return redirect('home')
         else:
+            record_login_failure(request, username)
             messages.error(request, 'Invalid credentials.')
     return render(request, 'accounts/login.html')
 
@@ -100,14 +95,10 @@ def two_factor_verify(request):
     if request.method == 'POST':
         form = TwoFactorForm(request.POST)
         if form.is_valid():
-            otp = form.cleaned_data['otp']
-            stored_otp = request.session.get('otp')
-            if str(otp) == str(stored_otp):
-                user_id = request.session.get('user_id')
-                user = CustomUser.objects.get(id=user_id)
+            user = verify_otp(request.session.get('otp_token'), form.cleaned_data['otp'], 'login')
+            if user is not None:
                 login(request, user)
-                del request.session['otp']
-                del request.session['user_id']
+                request.session.pop('otp_token', None)
                 return redirect('home')
             else:
                 messages.error(request, 'Invalid OTP.')
@@ -119,5 +110,32 @@ def logout_view(request):
     logout(request)
     return redirect('home')
 
+def order_data(order):
+    return {
+        'order_id': order.order_id,
+        'created_at': order.created_at.isoformat(),
+        'status': order.status,
+        'total_amount': str(order.total_amount),
+        'item_count': order.item_count,
+        'preferred_delivery_time': order.preferred_delivery_time.isoformat(),
+        'items': [
+            {
+                'product_id': item.product_id,
+                'name': item.product_name,
+                'quantity': item.quantity,
+                'price': str(item.price),
+            }
+            for item in order.items.all()
+        ],
+        'return_url': reverse('return_request', args=[order.order_id]) if order.status == 'Confirmed' else None,
+    }
+
+@login_required
 def profile(request):
-    return render(request, 'accounts/profile.html', {'user': request.user})
\ No newline at end of file
+    orders, next_cursor = order_history(request.user, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'orders': [order_data(order) for order in orders],
+            'next_cursor': next_cursor,
+        })
+    return render(request, 'accounts/profile.html', {'user': request.user, 'orders': orders, 'next_cursor': next_cursor})
\ No newline at end of file
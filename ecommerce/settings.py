@@ -1,4 +1,5 @@
 from pathlib import Path
+from celery.schedules import crontab
 from decouple import config
 import os
 
@@ -23,6 +24,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -32,11 +34,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Requests slower than this many milliseconds get a cProfile dump in PROFILE_DIR; 0 disables profiling
+PROFILE_SLOW_REQUESTS_MS = config('PROFILE_SLOW_REQUESTS_MS', default=0, cast=int)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+
 ROOT_URLCONF = 'ecommerce.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for shop.profiling.ProfilingMiddleware
+        'BACKEND': 'shop.profiling.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -71,6 +78,24 @@ else:
         }
     }
 
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('CACHE_URL', default='redis://localhost:6379/1'),
+        }
+    }
+
+# Sessions are read from the cache; cached_db still persists them, set SESSION_ENGINE to
+# django.contrib.sessions.backends.cache to skip the database entirely
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -89,6 +114,12 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Catalog imports may only read local images from this directory, and fetch at most this many bytes per image
+IMPORT_IMAGE_DIR = config('IMPORT_IMAGE_DIR', default=str(BASE_DIR / 'imports'))
+IMPORT_IMAGE_MAX_BYTES = config('IMPORT_IMAGE_MAX_BYTES', default=20 * 1024 * 1024, cast=int)
+# Hosts feed images may be downloaded from, comma separated; empty allows any public host
+IMPORT_IMAGE_HOSTS = config('IMPORT_IMAGE_HOSTS', default='', cast=lambda value: [host.strip().lower() for host in value.split(',') if host.strip()])
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
@@ -96,7 +127,14 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = config(
+    'EMAIL_BACKEND',
+    default='django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend',
+)
+# Used by the file based backend, a stand-in for a real mail server when benchmarking
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / 'sent_emails'))
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
+MAIL_BATCH_SIZE = config('MAIL_BATCH_SIZE', default=100, cast=int)
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
@@ -104,9 +142,43 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 
 AUTHENTICATION_BACKENDS = ['accounts.backends.EmailBackend']
+# Failed logins allowed per client IP and per account within the window, before logins are refused
+LOGIN_FAILURES_PER_IP = config('LOGIN_FAILURES_PER_IP', default=50, cast=int)
+LOGIN_FAILURES_PER_ACCOUNT = config('LOGIN_FAILURES_PER_ACCOUNT', default=10, cast=int)
+LOGIN_FAILURE_WINDOW = config('LOGIN_FAILURE_WINDOW', default=15 * 60, cast=int)
+# How long unknown identifiers and rejected passwords are remembered by the auth backend
+AUTH_NEGATIVE_CACHE_TTL = config('AUTH_NEGATIVE_CACHE_TTL', default=60, cast=int)
 
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
\ No newline at end of file
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'train-recommendations': {
+        'task': 'shop.tasks.train_recommendations',
+        'schedule': 60 * 60,
+    },
+    'release-expired-reservations': {
+        'task': 'shop.tasks.release_expired_reservations',
+        'schedule': 60,
+    },
+    'sweep-delivery-notifications': {
+        'task': 'shop.tasks.sweep_delivery_notifications',
+        'schedule': 60,
+    },
+    'drain-mail-queue': {
+        'task': 'shop.tasks.drain_mail_queue',
+        'schedule': 5,
+    },
+    'rollup-sales': {
+        'task': 'shop.tasks.rollup_sales',
+        'schedule': 15 * 60,
+    },
+    # Cancellations and rejected returns can change older days; catch up outside business hours
+    'rollup-sales-nightly': {
+        'task': 'shop.tasks.rollup_sales',
+        'schedule': crontab(hour=3, minute=0),
+        'args': (35,),
+    },
+}
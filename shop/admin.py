@@ -1,32 +1,188 @@
 from django.contrib import admin
-from .models import Product, CartItem, Order, OrderItem, ReturnRequest
+from django.utils import timezone
+from accounts.models import CustomUser
+from .models import Product, CartItem, Order, OrderItem, ReturnRequest, OutgoingEmail
+from .exports import export_response
+from .pagination import EstimatedCountPaginator
+
+# Status values are free text on the models; these are the ones the shop sets
+ORDER_STATUSES = [
+    ('confirmed', 'Awaiting payment'),
+    ('Confirmed', 'Confirmed'),
+    ('Shipped', 'Shipped'),
+    ('Delivered', 'Delivered'),
+    ('Cancelled', 'Cancelled'),
+]
+RETURN_STATUSES = [
+    ('Pending', 'Pending'),
+    ('Approved', 'Approved'),
+    ('Rejected', 'Rejected'),
+]
+
+class StatusFilter(admin.SimpleListFilter):
+    # A plain 'status' filter collects its choices with SELECT DISTINCT over the whole table
+    title = 'status'
+    parameter_name = 'status'
+    statuses = []
+
+    def lookups(self, request, model_admin):
+        return self.statuses
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(status=self.value())
+
+class OrderStatusFilter(StatusFilter):
+    statuses = ORDER_STATUSES
+
+class ReturnStatusFilter(StatusFilter):
+    statuses = RETURN_STATUSES
+
+class InputFilter(admin.SimpleListFilter):
+    """Sidebar filter with a text box instead of one link per related row."""
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # The form replaces the query string, so carry the other parameters along
+        yield {
+            'query_parts': [
+                (key, value) for key, values in changelist.filter_params.items()
+                if key != self.parameter_name for value in values
+            ],
+        }
+
+class UserFilter(InputFilter):
+    title = 'user (username or email)'
+    parameter_name = 'user'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            value = self.value().strip()
+            field = 'email' if '@' in value else 'username'
+            return queryset.filter(user__in=CustomUser.objects.filter(**{field: value}).values('pk'))
+
+class OrderFilter(InputFilter):
+    title = 'order ID'
+    parameter_name = 'order'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(order__order_id=self.value().strip())
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # No exact COUNT(*) of the whole table, and no per-choice facet counts
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price', 'stock', 'created_at']
-    list_filter = ['created_at']
-    search_fields = ['name', 'description']
+    list_display = ['name', 'sku', 'price', 'stock', 'is_active', 'created_at']
+    list_filter = ['is_active', 'created_at']
+    search_fields = ['name', 'description', 'sku']
+    actions = ['restock_ten']
+
+    @admin.action(description='Restock selected products (+10)')
+    def restock_ten(self, request, queryset):
+        updated = queryset.restock(10)
+        self.message_user(request, f'Restocked {updated} products.')
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     list_display = ['user', 'product', 'quantity', 'added_at']
-    list_filter = ['user', 'added_at']
-    search_fields = ['user__username', 'product__name']
+    list_select_related = ['user', 'product']
+    list_filter = [UserFilter, 'added_at']
+    search_fields = ['user__username__startswith', 'user__email__startswith']
+    autocomplete_fields = ['user', 'product']
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['order_id', 'user', 'total_amount', 'status', 'preferred_delivery_time']
-    list_filter = ['status', 'created_at']
-    search_fields = ['order_id', 'user__username']
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['order_id', 'user', 'total_amount', 'item_count', 'status', 'preferred_delivery_time', 'created_at']
+    list_select_related = ['user']
+    list_filter = [OrderStatusFilter, UserFilter, 'created_at']
+    # Prefix lookups can use the LIKE index PostgreSQL keeps for unique CharFields; icontains can't
+    search_fields = ['order_id__startswith']
+    ordering = ['-created_at']
+    autocomplete_fields = ['user']
+    raw_id_fields = ['address']
+    actions = ['mark_shipped', 'mark_delivered', 'mark_cancelled', 'export_csv', 'export_jsonl', 'export_items_csv']
+
+    def set_status(self, request, queryset, status):
+        updated = queryset.update(status=status)
+        self.message_user(request, f'Marked {updated} orders as {status}.')
+
+    @admin.action(description='Mark selected orders as Shipped')
+    def mark_shipped(self, request, queryset):
+        self.set_status(request, queryset, 'Shipped')
+
+    @admin.action(description='Mark selected orders as Delivered')
+    def mark_delivered(self, request, queryset):
+        self.set_status(request, queryset, 'Delivered')
+
+    @admin.action(description='Mark selected orders as Cancelled')
+    def mark_cancelled(self, request, queryset):
+        self.set_status(request, queryset, 'Cancelled')
+
+    @admin.action(description='Export selected orders as CSV')
+    def export_csv(self, request, queryset):
+        return export_response('orders', 'csv', queryset)
+
+    @admin.action(description='Export selected orders as JSON Lines')
+    def export_jsonl(self, request, queryset):
+        return export_response('orders', 'jsonl', queryset)
+
+    @admin.action(description='Export line items of selected orders as CSV')
+    def export_items_csv(self, request, queryset):
+        return export_response('items', 'csv', OrderItem.objects.filter(order__in=queryset.values('pk')))
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ['order', 'product', 'quantity', 'price']
-    list_filter = ['order']
-    search_fields = ['order__order_id', 'product__name']
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ['order', 'product_name', 'quantity', 'price']
+    list_select_related = ['order__user']
+    list_filter = [OrderFilter]
+    search_fields = ['order__order_id__startswith']
+    raw_id_fields = ['order']
+    autocomplete_fields = ['product']
 
 @admin.register(ReturnRequest)
-class ReturnRequestAdmin(admin.ModelAdmin):
+class ReturnRequestAdmin(LargeTableAdmin):
     list_display = ['order', 'status', 'created_at']
+    list_select_related = ['order__user']
+    list_filter = [ReturnStatusFilter, 'created_at']
+    search_fields = ['order__order_id__startswith']
+    raw_id_fields = ['order']
+    actions = ['approve', 'reject', 'export_csv']
+
+    def set_status(self, request, queryset, status):
+        updated = queryset.update(status=status)
+        self.message_user(request, f'Marked {updated} return requests as {status}.')
+
+    @admin.action(description='Approve selected return requests')
+    def approve(self, request, queryset):
+        self.set_status(request, queryset, 'Approved')
+
+    @admin.action(description='Reject selected return requests')
+    def reject(self, request, queryset):
+        self.set_status(request, queryset, 'Rejected')
+
+    @admin.action(description='Export selected return requests as CSV')
+    def export_csv(self, request, queryset):
+        return export_response('returns', 'csv', queryset)
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(LargeTableAdmin):
+    list_display = ['subject', 'status', 'attempts', 'send_after', 'sent_at']
     list_filter = ['status', 'created_at']
-    search_fields = ['order__order_id']
\ No newline at end of file
+    search_fields = ['subject']
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, send_after=timezone.now())
+        self.message_user(request, f'Queued {updated} emails for retry.')
@@ -0,0 +1,79 @@
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from django.core.cache import cache, caches
+
+PRODUCT_TTL = 60 * 60
+LISTING_TTL = 10 * 60
+# Outlives every entry keyed by a version. Versions are looked up for any
+# requested pk, nonexistent ones included, so they mustn't live forever.
+VERSION_TTL = 24 * 60 * 60
+
+# Hits and misses per namespace, kept per process
+CACHE_STATS = Counter()
+# Hits and misses of the current request, when shop.profiling is tallying them
+request_cache_stats = ContextVar('request_cache_stats', default=None)
+
+def new_version():
+    # Time based, so a version evicted from the cache is never reused
+    return time.time_ns()
+
+def product_version_key(pk):
+    return f'product:{pk}:version'
+
+def catalog_version():
+    version = cache.get('catalog:version')
+    if version is None:
+        version = new_version()
+        cache.set('catalog:version', version, None)
+    return version
+
+def product_versions(pks):
+    keys = {pk: product_version_key(pk) for pk in pks}
+    found = cache.get_many(keys.values())
+    missing = {key: new_version() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, VERSION_TTL)
+        found.update(missing)
+    return {pk: found[key] for pk, key in keys.items()}
+
+def attach_versions(products):
+    """Set ``cache_version`` on each product, for keying its template fragments."""
+    versions = product_versions([product.pk for product in products])
+    for product in products:
+        product.cache_version = versions[product.pk]
+    return products
+
+def invalidate_products(pks, catalog=True):
+    """Bump the version of each product and, unless ``catalog`` is false, of the catalogue listings."""
+    version = new_version()
+    cache.set_many({product_version_key(pk): version for pk in pks}, VERSION_TTL)
+    if catalog:
+        cache.set('catalog:version', version, None)
+
+def cached(namespace, key, build, timeout):
+    full_key = f'{namespace}:{key}'
+    value = cache.get(full_key)
+    result = 'miss' if value is None else 'hit'
+    CACHE_STATS[f'{namespace}.{result}'] += 1
+    tally = request_cache_stats.get()
+    if tally is not None:
+        tally[result] += 1
+    if value is not None:
+        return value
+    value = build()
+    cache.set(full_key, value, timeout)
+    return value
+
+def cache_stats():
+    namespaces = sorted({name.rsplit('.', 1)[0] for name in CACHE_STATS})
+    stats = {}
+    for namespace in namespaces:
+        hits, misses = CACHE_STATS[f'{namespace}.hit'], CACHE_STATS[f'{namespace}.miss']
+        stats[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return {'pid': os.getpid(), 'backend': caches['default'].__class__.__name__, 'namespaces': stats}
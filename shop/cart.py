@@ -0,0 +1,168 @@
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Window
+from django.utils.functional import cached_property
+from .models import CartItem, Product
+
+SESSION_KEY = 'cart'
+
+class BaseCart:
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def refresh(self):
+        self.__dict__.pop('items', None)
+
+    def quantity(self, product_id):
+        return next((item.quantity for item in self.items if item.product_id == product_id), 0)
+
+    def summary(self):
+        return {
+            'items': [
+                {
+                    'product_id': item.product_id,
+                    'name': item.product.name,
+                    'price': str(item.product.price),
+                    'quantity': item.quantity,
+                    'line_total': str(item.line_total),
+                }
+                for item in self.items
+            ],
+            'count': sum(item.quantity for item in self.items),
+            'total': str(self.total),
+        }
+
+class SessionCart(BaseCart):
+    """An anonymous visitor's cart, kept in the session.
+
+    Mutations only touch the session, which is written once at the end of
+    the request however many changes were made. The cart is folded into
+    the stored CartItem rows in one statement when the visitor logs in.
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+        self.lines = {int(pk): quantity for pk, quantity in self.session.get(SESSION_KEY, {}).items()}
+
+    @cached_property
+    def items(self):
+        products = Product.objects.in_bulk(list(self.lines))
+        items = []
+        for product_id, quantity in self.lines.items():
+            product = products.get(product_id)
+            if product is None:
+                continue
+            item = CartItem(product=product, quantity=quantity)
+            item.line_total = product.price * quantity
+            items.append(item)
+        return items
+
+    @property
+    def total(self):
+        return sum((item.line_total for item in self.items), Decimal('0.00'))
+
+    def quantity(self, product_id):
+        return self.lines.get(product_id, 0)
+
+    def add(self, product_id, quantity=1):
+        self.set(product_id, self.quantity(product_id) + quantity)
+
+    def set(self, product_id, quantity):
+        if quantity > 0:
+            self.lines[product_id] = quantity
+        else:
+            self.lines.pop(product_id, None)
+        self.session[SESSION_KEY] = {str(pk): quantity for pk, quantity in self.lines.items()}
+        self.refresh()
+
+    def clear(self):
+        self.lines = {}
+        self.session.pop(SESSION_KEY, None)
+        self.refresh()
+
+class DatabaseCart(BaseCart):
+    """A logged-in user's cart, stored as CartItem rows.
+
+    Items come back in a single query with their product joined in, the
+    per-line totals computed by the database and the cart total as a window
+    aggregate over the same rows. Every change is one conditional statement,
+    so concurrent requests can't lose increments or create duplicate rows.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def items(self):
+        line_total = ExpressionWrapper(
+            F('quantity') * F('product__price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        return list(
+            CartItem.objects.filter(user=self.user)
+            .select_related('product')
+            .annotate(line_total=line_total, cart_total=Window(Sum(line_total)))
+            .order_by('added_at', 'pk')
+        )
+
+    @property
+    def total(self):
+        return self.items[0].cart_total if self.items else Decimal('0.00')
+
+    def add(self, product_id, quantity=1):
+        items = CartItem.objects.filter(user=self.user, product_id=product_id)
+        if quantity < 0:
+            # Decrement only rows that stay positive; anything else empties the line
+            if not items.filter(quantity__gt=-quantity).update(quantity=F('quantity') + quantity):
+                items.delete()
+        elif not items.update(quantity=F('quantity') + quantity):
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(user=self.user, product_id=product_id, quantity=quantity)
+            except IntegrityError:
+                # A concurrent request inserted the row first
+                items.update(quantity=F('quantity') + quantity)
+        self.refresh()
+
+    def set(self, product_id, quantity):
+        if quantity > 0:
+            save_lines(self.user, {product_id: quantity})
+        else:
+            CartItem.objects.filter(user=self.user, product_id=product_id).delete()
+        self.refresh()
+
+    def clear(self):
+        CartItem.objects.filter(user=self.user).delete()
+        self.refresh()
+
+def save_lines(user, lines):
+    """Upsert ``lines`` ({product_id: quantity}) as the user's CartItem rows in one statement."""
+    existing = set(Product.objects.filter(pk__in=list(lines)).values_list('pk', flat=True))
+    CartItem.objects.bulk_create(
+        [CartItem(user=user, product_id=pk, quantity=quantity) for pk, quantity in lines.items() if pk in existing],
+        update_conflicts=True,
+        unique_fields=['user', 'product'],
+        update_fields=['quantity'],
+    )
+
+def merge_session_cart(sender, request, user, **kwargs):
+    """On login, fold the anonymous session cart into the stored one."""
+    session_lines = {int(pk): quantity for pk, quantity in request.session.pop(SESSION_KEY, {}).items()}
+    if session_lines:
+        stored = dict(CartItem.objects.filter(user=user, product_id__in=list(session_lines))
+                      .values_list('product_id', 'quantity'))
+        save_lines(user, {pk: stored.get(pk, 0) + quantity for pk, quantity in session_lines.items()})
+
+def get_cart(request):
+    if not hasattr(request, '_cart'):
+        if request.user.is_authenticated:
+            request._cart = DatabaseCart(request.user)
+        else:
+            request._cart = SessionCart(request)
+    return request._cart
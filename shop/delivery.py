@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.utils import timezone
+from .mail import queue_mails
+from .models import Order
+
+# Orders become eligible once payment has been taken
+NOTIFY_STATUS = 'Confirmed'
+SWEEP_BATCH = 500
+
+def notify_due_orders(orders=None, limit=SWEEP_BATCH):
+    """Queue out-for-delivery emails for paid orders whose delivery time has come.
+
+    Due orders are found with one query on the (status,
+    preferred_delivery_time) index, locked with SKIP LOCKED and stamped
+    with delivery_notified_at in the same transaction as their emails are
+    queued. An order is therefore notified exactly once, even when
+    several sweeps overlap.
+    Returns the number of orders notified.
+    """
+    now = timezone.now()
+    orders = Order.objects.all() if orders is None else orders
+    with transaction.atomic():
+        due = list(
+            orders.select_for_update(skip_locked=True, of=('self',))
+            .filter(status=NOTIFY_STATUS, preferred_delivery_time__lte=now, delivery_notified_at__isnull=True)
+            .select_related('user', 'address')
+            .order_by('preferred_delivery_time')[:limit]
+        )
+        if not due:
+            return 0
+        Order.objects.filter(pk__in=[order.pk for order in due]).update(delivery_notified_at=now)
+        queue_mails([
+            (
+                'Your Order is Out for Delivery',
+                f'Order {order.order_id} is out for delivery to {order.address}.',
+                [order.user.email],
+            )
+            for order in due
+        ])
+    return len(due)
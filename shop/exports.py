@@ -0,0 +1,67 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .models import Order, OrderItem, ReturnRequest
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Each export is a values() query: rows come off the cursor as dicts, without building model instances
+EXPORTS = {
+    'orders': (Order, [
+        'order_id', 'created_at', 'user__username', 'user__email', 'status', 'payment_method',
+        'total_amount', 'item_count', 'preferred_delivery_time',
+        'address__city', 'address__state', 'address__zip_code', 'address__country',
+    ]),
+    'items': (OrderItem, [
+        'order__order_id', 'order__created_at', 'order__status',
+        'product_id', 'product_name', 'quantity', 'price',
+    ]),
+    'returns': (ReturnRequest, [
+        'order__order_id', 'created_at', 'status', 'description',
+    ]),
+}
+
+def export_rows(kind, queryset=None):
+    """Yield the rows of export ``kind`` as dicts, in primary key order.
+
+    ``queryset`` narrows the export, e.g. to the orders picked in the
+    admin. The rows are read with iterator(), which uses a server-side
+    cursor on PostgreSQL, so only CHUNK_SIZE rows are held at a time.
+    """
+    model, columns = EXPORTS[kind]
+    if queryset is None:
+        queryset = model.objects.all()
+    return queryset.order_by('pk').values(*columns).iterator(chunk_size=CHUNK_SIZE)
+
+class Echo:
+    # csv.writer wants a file; this one hands each formatted line straight back
+    def write(self, value):
+        return value
+
+def csv_lines(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+def export_lines(kind, fmt, queryset=None):
+    rows = export_rows(kind, queryset)
+    if fmt == 'csv':
+        return csv_lines(rows, EXPORTS[kind][1])
+    return jsonl_lines(rows)
+
+def export_response(kind, fmt, queryset=None):
+    response = StreamingHttpResponse(export_lines(kind, fmt, queryset), content_type=FORMATS[fmt])
+    filename = f'{kind}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,88 @@
+from io import BytesIO
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from .caching import invalidate_products
+from .models import Product
+from .storage import product_image_storage
+
+# Target widths; the height follows the original aspect ratio
+RENDITIONS = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1200,
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+# Layout widths for the sizes attribute, matching the grids in the templates
+SIZES = {
+    'thumb': '160px',
+    'card': '(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw',
+    'detail': '(min-width: 768px) 50vw, 100vw',
+}
+
+def render_image(image, width, options):
+    resized = image.copy()
+    if resized.width > width:
+        resized.thumbnail((width, width * resized.height // resized.width), Image.LANCZOS)
+    buffer = BytesIO()
+    resized.save(buffer, **options)
+    return resized.width, ContentFile(buffer.getvalue())
+
+def generate_renditions(product_id, force=False):
+    """Write resized WebP and JPEG copies of a product's image.
+
+    Renditions go to the same content-addressed storage as the originals,
+    so products sharing an image share its renditions too.
+
+    The result is stored in Product.renditions as
+    {'source': <image name>, <size>: {'width': w, 'webp': name, 'jpeg': name}}.
+    The renditions are skipped if they are already current, unless
+    ``force`` is set. The row is only updated if the image is still the
+    one that was rendered, so a re-upload during the run isn't
+    overwritten with stale renditions.
+    """
+    product = Product.objects.filter(pk=product_id).only('image', 'renditions').first()
+    if product is None or not product.image:
+        return None
+    source = product.image.name
+    if not force and product.renditions.get('source') == source:
+        return product.renditions
+
+    with product.image.open('rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original = original.convert('RGB')
+    renditions = {'source': source}
+    for size, width in RENDITIONS.items():
+        entry = {}
+        for extension, options in FORMATS.items():
+            entry['width'], content = render_image(original, width, options)
+            entry[extension] = product_image_storage.save(f'products/renditions/{size}.{extension}', content)
+        renditions[size] = entry
+
+    if Product.objects.filter(pk=product_id, image=source).update(renditions=renditions):
+        # Cards and detail pages are cached with the old markup
+        invalidate_products([product_id])
+    return renditions
+
+def srcset(product, extension):
+    entries = sorted(
+        (entry for size, entry in product.renditions.items() if size != 'source'),
+        key=lambda entry: entry['width'],
+    )
+    seen, candidates = set(), []
+    for entry in entries:
+        # Small originals produce several renditions of the same width
+        if entry['width'] not in seen:
+            seen.add(entry['width'])
+            candidates.append(f'{product_image_storage.url(entry[extension])} {entry["width"]}w')
+    return ', '.join(candidates)
+
+def rendition_url(product, size, extension='jpeg'):
+    """URL of a rendition, falling back to the original until renditions exist."""
+    if not product.image:
+        return None
+    if product.renditions.get('source') == product.image.name:
+        return product_image_storage.url(product.renditions[size][extension])
+    return product.image.url
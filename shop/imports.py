@@ -0,0 +1,209 @@
+import csv
+import ipaddress
+import json
+import os
+import posixpath
+import socket
+from io import BytesIO
+from urllib.parse import urljoin, urlparse
+import requests
+from PIL import Image
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from .caching import invalidate_products
+from .images import generate_renditions
+from .models import Product
+from .search import get_search_engine
+from .storage import product_image_storage
+
+CHUNK_SIZE = 1000
+IMAGE_TIMEOUT = 20
+DOWNLOAD_CHUNK = 64 * 1024
+MAX_REDIRECTS = 3
+# Columns taken from the feed; anything else in a row is ignored
+IMPORT_FIELDS = ['sku', 'name', 'description', 'price', 'stock', 'is_active']
+# Rewritten on every import; created_at, image and renditions are left alone
+UPDATE_FIELDS = ['name', 'description', 'price', 'stock', 'is_active']
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+def read_rows(path, fmt):
+    """Yield (line number, row) from a CSV (with a header) or JSON Lines file.
+
+    JSON lines are yielded unparsed and decoded by clean_row, so a bad
+    line is reported like any other invalid row.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            yield from enumerate(csv.DictReader(f), start=2)
+        else:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield number, line
+
+def clean_row(row):
+    """Validate one feed row and return (field values, image source).
+
+    Values are checked with the model fields' own validators. Raises
+    ValidationError with every problem in the row.
+    """
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as e:
+            raise ValidationError(f'invalid JSON: {e}')
+        if not isinstance(row, dict):
+            raise ValidationError('expected a JSON object')
+    values, errors = {}, []
+    for name in IMPORT_FIELDS:
+        raw = row.get(name)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if name == 'is_active':
+            raw = parse_bool(raw)
+        elif name == 'stock' and raw in (None, ''):
+            raw = 0
+        elif name == 'stock' and isinstance(raw, float) and not raw.is_integer():
+            # IntegerField.clean would silently truncate 2.7 to 2
+            errors.append('stock: Enter a whole number.')
+            continue
+        field = Product._meta.get_field(name)
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as e:
+            errors.extend(f'{name}: {message}' for message in e.messages)
+    if 'sku' in values and not values['sku']:
+        errors.append('sku: This field cannot be blank.')
+    if errors:
+        raise ValidationError(errors)
+    return values, str(row.get('image') or '').strip()
+
+def parse_bool(value):
+    if value in (None, ''):
+        return True
+    if isinstance(value, bool):
+        return value
+    text = str(value).lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return value
+
+def upsert_products(rows, queue_images=True):
+    """Insert or update a chunk of cleaned rows ({sku: (values, image)}) by SKU.
+
+    One INSERT ... ON CONFLICT (sku) DO UPDATE writes the whole chunk.
+    bulk_create sends no post_save, so the search index and the product
+    caches are refreshed here. Images whose source changed are fetched by
+    the import_product_image task. Returns (created, updated, images queued).
+    """
+    existing = {
+        sku: (pk, image_source)
+        for sku, pk, image_source in Product.objects.filter(sku__in=list(rows)).values_list('sku', 'pk', 'image_source')
+    }
+    Product.objects.bulk_create(
+        [Product(**values) for values, _ in rows.values()],
+        update_conflicts=True,
+        unique_fields=['sku'],
+        update_fields=UPDATE_FIELDS,
+    )
+    created = [sku for sku in rows if sku not in existing]
+    pks = {sku: pk for sku, (pk, _) in existing.items()}
+    pks.update(Product.objects.filter(sku__in=created).values_list('sku', 'pk'))
+
+    get_search_engine().index_products(list(pks.values()))
+    invalidate_products(list(pks.values()))
+
+    queued = 0
+    if queue_images:
+        from .tasks import import_product_image
+        for sku, (_, image) in rows.items():
+            if image and image != existing.get(sku, (None, ''))[1]:
+                import_product_image.delay(pks[sku], image)
+                queued += 1
+    return len(created), len(existing), queued
+
+class ImageImportError(Exception):
+    pass
+
+def check_host(url):
+    # Feeds are untrusted: never let them reach loopback, private or metadata addresses
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host:
+        raise ImageImportError(f'Unsupported image source {url}')
+    if settings.IMPORT_IMAGE_HOSTS and host not in settings.IMPORT_IMAGE_HOSTS:
+        raise ImageImportError(f'{host} is not in IMPORT_IMAGE_HOSTS')
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or parsed.scheme, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ImageImportError(f'Could not resolve {host}: {e}')
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ImageImportError(f'{host} resolves to non-public address {address}')
+
+def fetch_url(url):
+    """Download ``url`` to memory, up to IMPORT_IMAGE_MAX_BYTES.
+
+    The host is checked before the request and again on every redirect.
+    """
+    limit = settings.IMPORT_IMAGE_MAX_BYTES
+    for _ in range(MAX_REDIRECTS + 1):
+        check_host(url)
+        with requests.get(url, timeout=IMAGE_TIMEOUT, stream=True, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['Location'])
+                continue
+            response.raise_for_status()
+            if int(response.headers.get('Content-Length') or 0) > limit:
+                raise ImageImportError(f'{url} is larger than {limit} bytes')
+            content = BytesIO()
+            for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                content.write(chunk)
+                if content.tell() > limit:
+                    raise ImageImportError(f'{url} is larger than {limit} bytes')
+            return content.getvalue()
+    raise ImageImportError(f'Too many redirects fetching {url}')
+
+def read_local(path):
+    # Feeds are untrusted: only files inside IMPORT_IMAGE_DIR may be read
+    root = os.path.realpath(settings.IMPORT_IMAGE_DIR)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ImageImportError(f'{path} is outside IMPORT_IMAGE_DIR')
+    if os.path.getsize(full) > settings.IMPORT_IMAGE_MAX_BYTES:
+        raise ImageImportError(f'{path} is larger than {settings.IMPORT_IMAGE_MAX_BYTES} bytes')
+    with open(full, 'rb') as f:
+        return f.read()
+
+def import_image(product_id, source):
+    """Fetch an image from an http(s) URL or IMPORT_IMAGE_DIR and make it the product's image.
+
+    Skipped if the product already uses an image from ``source``. The
+    bytes must open as an image before anything is stored, and downloads
+    are capped at IMPORT_IMAGE_MAX_BYTES. Only the image columns are
+    updated, so a concurrent import's changes to the rest of the row
+    survive. Renditions are generated right away, as this runs in a
+    worker anyway. Raises ImageImportError for unusable sources.
+    """
+    if not Product.objects.filter(pk=product_id).exclude(image_source=source).exists():
+        return None
+    scheme = urlparse(source).scheme
+    if scheme in ('http', 'https'):
+        content = fetch_url(source)
+    elif scheme:
+        raise ImageImportError(f'Unsupported image source {source}')
+    else:
+        content = read_local(source)
+    try:
+        Image.open(BytesIO(content)).verify()
+    except Exception as e:
+        raise ImageImportError(f'{source} is not an image: {e}')
+    filename = posixpath.basename(urlparse(source).path) or 'image.jpg'
+    name = product_image_storage.save(f'products/{filename}', ContentFile(content))
+    Product.objects.filter(pk=product_id).update(image=name, image_source=source)
+    invalidate_products([product_id])
+    generate_renditions(product_id)
+    return name
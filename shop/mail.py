@@ -0,0 +1,92 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutgoingEmail
+
+BATCH_SIZE = getattr(settings, 'MAIL_BATCH_SIZE', 100)
+MAX_ATTEMPTS = 5
+RETRY_BASE = timedelta(seconds=30)
+# How long a worker may hold a batch before other workers treat it as abandoned
+LEASE = timedelta(minutes=5)
+
+def queue_mail(subject, body, recipients, from_email=None):
+    """Store a message for the mail worker instead of sending it inline.
+
+    The request only pays for one INSERT; delivery happens in
+    drain_mail_queue, which sends whole batches over a single connection.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.EMAIL_HOST_USER,
+        recipients=list(recipients),
+    )
+
+def queue_mails(messages):
+    """Queue several (subject, body, recipients) messages with one INSERT."""
+    return OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(subject=subject, body=body, from_email=settings.EMAIL_HOST_USER, recipients=list(recipients))
+        for subject, body, recipients in messages
+    ])
+
+def retry_delay(attempts):
+    return RETRY_BASE * 2 ** (attempts - 1)
+
+def claim_batch(limit):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', send_after__lte=now)
+            .order_by('send_after', 'pk')[:limit]
+        )
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(send_after=now + LEASE)
+    return batch
+
+def record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.send_after = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'send_after'])
+
+def send_batch(limit=BATCH_SIZE, connection=None):
+    """Send up to ``limit`` due messages over one mail connection.
+
+    Messages are claimed by pushing ``send_after`` forward, so concurrent
+    workers skip them and a crashed worker's batch becomes due again once
+    the lease runs out. Failed messages back off exponentially and are
+    marked failed after MAX_ATTEMPTS. Returns the number claimed.
+    """
+    batch = claim_batch(limit)
+    if not batch:
+        return 0
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: nothing was attempted, so the whole batch backs off
+        for email in batch:
+            record_failure(email, e)
+        return len(batch)
+
+    sent = []
+    try:
+        for email in batch:
+            # One message per call: a batched send_messages only reports how many
+            # went out, not which, and saves nothing once the connection is open
+            message = EmailMessage(email.subject, email.body, email.from_email, email.recipients, connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                record_failure(email, e)
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+    OutgoingEmail.objects.filter(pk__in=sent).update(status='sent', sent_at=timezone.now(), last_error='')
+    return len(batch)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from shop.models import Order, OrderItem, Product
+
+class Command(BaseCommand):
+    help = 'Fill Order.item_count and OrderItem.product_name for orders placed before they existed.'
+
+    def handle(self, *args, **options):
+        names = OrderItem.objects.filter(product_name='', product__isnull=False).update(
+            product_name=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('name')[:1])
+        )
+        units = (OrderItem.objects.filter(order=OuterRef('pk')).order_by()
+                 .values('order').annotate(total=Sum('quantity')).values('total'))
+        counts = Order.objects.filter(item_count=0).update(item_count=Coalesce(Subquery(units), 0))
+        self.stdout.write(self.style.SUCCESS(f'Named {names} order items; counted items on {counts} orders'))
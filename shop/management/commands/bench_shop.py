@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.utils import timezone
+from accounts.models import CustomUser
+from ecommerce.celery import app
+from shop.models import Product
+from shop.management.commands.benchmark_search import BRANDS, KINDS, Rollback, percentile
+
+PASSWORD = 'bench-password'
+
+class Command(BaseCommand):
+    help = 'Drive the main shop flows through the test client and report latency and queries per request.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint, to fill caches.')
+        parser.add_argument('--max-p99', type=float, help='Fail if any endpoint p99 exceeds this many milliseconds.')
+        parser.add_argument('--max-queries', type=float, help='Fail if any endpoint averages more queries per request.')
+
+    def handle(self, *args, **options):
+        if not Product.objects.available().exists():
+            raise CommandError('No products to browse; run seed_shop first.')
+        # In-process only: allow the test host, keep mail in memory, run tasks inline instead of via the broker
+        setup_test_environment()
+        app.conf.task_always_eager = True
+        self.rng = random.Random(42)
+        self.samples = defaultdict(list)
+        try:
+            # Orders, reservations and stock changes made by the run are rolled back
+            with transaction.atomic():
+                user, product = self.fixtures()
+                self.run(user, product, options['warmup'], record=False)
+                self.run(user, product, options['requests'], record=True)
+                raise Rollback
+        except Rollback:
+            pass
+        self.report(options['max_p99'], options['max_queries'])
+
+    def fixtures(self):
+        user = CustomUser(username='bench-user', email='bench-user@example.com', phone_number='+919999999999', is_verified=True)
+        user.set_password(PASSWORD)
+        user.save()
+        # Enough stock that repeated checkouts never run out
+        product = Product.objects.create(name='Bench product', description='Benchmark', price=Decimal('10.00'), stock=10 ** 6)
+        return user, product
+
+    def run(self, user, product, iterations, record):
+        self.record = record
+        anonymous = Client()
+        shopper = Client()
+        shopper.force_login(user)
+        delivery = (timezone.now().astimezone(ZoneInfo('Asia/Kolkata')) + timedelta(days=2)).strftime('%Y-%m-%dT%H:%M')
+        address = {'street': '1 Bench Road', 'city': 'Pune', 'state': 'Maharashtra', 'zip_code': '411001', 'country': 'India'}
+
+        for _ in range(iterations):
+            self.hit('home', 200, anonymous.get, '/')
+            self.hit('search', 200, anonymous.get, '/search/', {'q': f'{self.rng.choice(BRANDS)} {self.rng.choice(KINDS)}'})
+            shopper.post(f'/api/cart/items/{product.pk}/', '{"delta": 2}', content_type='application/json')
+            self.hit('cart', 200, shopper.get, '/cart/')
+            self.hit('checkout (GET)', 200, shopper.get, '/checkout/')
+            self.hit('checkout (POST)', 302, shopper.post, '/checkout/', {**address, 'preferred_delivery_time': delivery})
+            self.hit('payment (GET)', 200, shopper.get, '/payment/')
+            self.hit('payment (POST)', 302, shopper.post, '/payment/', {'payment_method': 'UPI'})
+            self.hit('login', 302, Client().post, '/accounts/login/', {'username': user.email, 'password': PASSWORD})
+
+    def hit(self, label, expected_status, method, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = method(*args, **kwargs)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != expected_status:
+            raise CommandError(f'{label}: expected {expected_status}, got {response.status_code}')
+        if self.record:
+            self.samples[label].append((elapsed, len(queries)))
+
+    def report(self, max_p99, max_queries):
+        self.stdout.write(f'{"endpoint":<18}{"p50 ms":>10}{"p99 ms":>10}{"mean ms":>10}{"queries":>10}')
+        over_budget = []
+        for label, samples in self.samples.items():
+            latencies = [elapsed for elapsed, _ in samples]
+            queries = statistics.mean(count for _, count in samples)
+            p99 = percentile(latencies, 99)
+            self.stdout.write(f'{label:<18}{percentile(latencies, 50):>10.2f}{p99:>10.2f}{statistics.mean(latencies):>10.2f}{queries:>10.1f}')
+            if (max_p99 is not None and p99 > max_p99) or (max_queries is not None and queries > max_queries):
+                over_budget.append(label)
+        if over_budget:
+            raise CommandError(f'Over budget: {", ".join(over_budget)}')
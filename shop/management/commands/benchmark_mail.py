@@ -0,0 +1,48 @@
+import tempfile
+import time
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from shop.mail import queue_mail, send_batch
+from shop.models import OutgoingEmail
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = 'Compare one connection per email with the batched mail queue, against a local stand-in backend.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--backend', default='django.core.mail.backends.filebased.EmailBackend',
+                            help='Mail backend to send through; defaults to writing files to a temporary directory. Point it at the SMTP backend and a local debugging server to include connection setup costs.')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        with tempfile.TemporaryDirectory() as outbox, override_settings(EMAIL_BACKEND=options['backend'], EMAIL_FILE_PATH=outbox):
+            started = time.perf_counter()
+            for i in range(count):
+                send_mail(f'Benchmark {i}', 'Body', 'shop@example.com', [f'user{i}@example.com'])
+            self.report('send_mail per message', count, time.perf_counter() - started)
+
+            try:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    for i in range(count):
+                        queue_mail(f'Benchmark {i}', 'Body', [f'user{i}@example.com'], 'shop@example.com')
+                    self.report('queue_mail (request side)', count, time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    while send_batch(options['batch_size']):
+                        pass
+                    self.report('batched worker', count, time.perf_counter() - started)
+                    sent = OutgoingEmail.objects.filter(status='sent', subject__startswith='Benchmark ').count()
+                    self.stdout.write(f'{sent}/{count} queued messages sent')
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f'{label:<28}{elapsed:>8.2f}s {count / elapsed:>10.0f} msg/s')
@@ -0,0 +1,71 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from shop.models import Product
+from shop.search import get_search_engine
+
+BRANDS = ['apple', 'samsung', 'adidas', 'nike', 'sony', 'lenovo', 'puma', 'oneplus', 'xiaomi', 'bosch']
+KINDS = ['phone', 'shoes', 'laptop', 'headphones', 'watch', 'jacket', 'camera', 'tablet', 'speaker', 'backpack']
+ADJECTIVES = ['pro', 'max', 'lite', 'ultra', 'classic', 'wireless', 'running', 'smart', 'mini', 'sport']
+
+class Rollback(Exception):
+    pass
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class Command(BaseCommand):
+    help = 'Measure product search and autocomplete latency, optionally on a synthetic catalogue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Synthetic products to insert first.')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic products afterwards.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        vocabulary = [f'{rng.choice("bcdfgklmnprstv")}{rng.choice("aeiou")}{rng.randrange(100, 999)}' for _ in range(5000)]
+        try:
+            with transaction.atomic():
+                self.seed(options['products'], vocabulary, rng)
+                self.run(options['queries'], vocabulary, rng)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count, vocabulary, rng):
+        if not count:
+            return
+        started = time.perf_counter()
+        products = []
+        for i in range(count):
+            name = f'{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(KINDS)} {i}'
+            description = ' '.join(rng.choice(vocabulary) for _ in range(30))
+            products.append(Product(name=name, description=description, price=Decimal(rng.randrange(100, 99900)) / 100, stock=rng.randrange(0, 50)))
+        Product.objects.bulk_create(products, batch_size=2000)
+        self.stdout.write(f'Inserted {count} products in {time.perf_counter() - started:.1f}s')
+        started = time.perf_counter()
+        get_search_engine().rebuild()
+        self.stdout.write(f'Built search index in {time.perf_counter() - started:.1f}s')
+
+    def run(self, queries, vocabulary, rng):
+        engine = get_search_engine()
+        workloads = {
+            'search': lambda: engine.search(f'{rng.choice(BRANDS)} {rng.choice(KINDS)}'),
+            'search (rare term)': lambda: engine.search(rng.choice(vocabulary)),
+            'autocomplete': lambda: engine.autocomplete(rng.choice(KINDS)[:3]),
+            'name__icontains': lambda: list(Product.objects.filter(name__icontains=rng.choice(KINDS)).values_list('pk', flat=True)[:24]),
+        }
+        self.stdout.write(f'{"workload":<20}{"p50 ms":>10}{"p99 ms":>10}{"mean ms":>10}')
+        for label, workload in workloads.items():
+            samples = []
+            for _ in range(queries):
+                started = time.perf_counter()
+                workload()
+                samples.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f'{label:<20}{percentile(samples, 50):>10.2f}{percentile(samples, 99):>10.2f}{statistics.mean(samples):>10.2f}')
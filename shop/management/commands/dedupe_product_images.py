@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from shop.caching import invalidate_products
+from shop.images import generate_renditions
+from shop.models import Product
+from shop.storage import is_hashed, product_image_storage, walk
+
+class Command(BaseCommand):
+    help = 'Move product images into content-addressed storage so identical files are stored once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Delete files in products/ that no product references once moved.')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete content-addressed blobs that no product image or rendition references.')
+
+    def handle(self, *args, **options):
+        storage = product_image_storage
+        before = self.disk_usage('products')
+        images = Product.objects.exclude(image='').exclude(image__isnull=True)
+
+        moved = 0
+        for old in images.order_by().values_list('image', flat=True).distinct():
+            if is_hashed(old):
+                continue
+            if not storage.exists(old):
+                self.stderr.write(f'Missing file {old}, skipped')
+                continue
+            with storage.open(old, 'rb') as f:
+                new = storage.save(old, f)
+            pks = list(Product.objects.filter(image=old).values_list('pk', flat=True))
+            Product.objects.filter(pk__in=pks).update(image=new)
+            # Products sharing an image share its renditions, so render once
+            renditions = generate_renditions(pks[0])
+            Product.objects.filter(pk__in=pks[1:]).update(renditions=renditions)
+            invalidate_products(pks)
+            moved += 1
+            self.stdout.write(f'{old} -> {new} ({len(pks)} products)')
+
+        if options['delete_originals'] or options['prune']:
+            referenced = set(images.values_list('image', flat=True))
+            for renditions in Product.objects.exclude(renditions={}).values_list('renditions', flat=True):
+                referenced.update(
+                    name for size, entry in renditions.items() if size != 'source'
+                    for key, name in entry.items() if key != 'width'
+                )
+            for name in walk('products'):
+                if name in referenced:
+                    continue
+                if options['prune'] if is_hashed(name) else options['delete_originals']:
+                    storage.delete(name)
+                    self.stdout.write(f'Deleted {name}')
+
+        after = self.disk_usage('products')
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} images; products/ now uses {after / 1024:.0f} KiB (was {before / 1024:.0f} KiB)'
+        ))
+
+    def disk_usage(self, directory):
+        return sum(product_image_storage.size(name) for name in walk(directory))
@@ -0,0 +1,121 @@
+import random
+import re
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from accounts.models import CustomUser
+from shop.delivery import NOTIFY_STATUS
+from shop.models import CartItem, Order, OutgoingEmail, Product, Rating, StockReservation
+from shop.views import PAGE_SIZE, listing_queryset
+
+STATUSES = ['confirmed', 'Confirmed', 'Shipped', 'Delivered', 'Cancelled']
+
+class Rollback(Exception):
+    pass
+
+def sequential_scans(plan):
+    """Tables the plan reads in full, for PostgreSQL and SQLite plan output."""
+    if connection.vendor == 'postgresql':
+        return re.findall(r'Seq Scan on (\w+)', plan)
+    # SQLite: "SCAN table" is a full scan, "SCAN table USING INDEX" walks an index in order
+    return re.findall(r'SCAN (\w+)\b(?! USING)', plan)
+
+class Command(BaseCommand):
+    help = "EXPLAIN the canonical queries behind the shop's views and fail on sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Orders and ratings to seed; users and products get a tenth.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows afterwards.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user, product = self.seed(options['rows'], random.Random(42))
+                if user is None or product is None:
+                    raise CommandError('No users or products to query; seed some with --rows.')
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                failures = self.run(user, product)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError(f'Sequential scans in: {", ".join(failures)}')
+
+    def seed(self, rows, rng):
+        if not rows:
+            return CustomUser.objects.first(), Product.objects.first()
+        now = timezone.now()
+        tag = rng.randrange(10 ** 6)
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'explain-{tag}-{i}',
+                email=f'explain-{tag}-{i}@example.com',
+                phone_number=f'+1202{tag % 1000:03d}{i:04d}',
+                verification_token='' if i % 10 else f'token-{tag}-{i}',
+            )
+            for i in range(max(rows // 10, 1))
+        ], batch_size=2000)
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description='Seeded for explain_queries', price=Decimal(rng.randrange(100, 99900)) / 100,
+                    stock=rng.randrange(0, 50), is_active=bool(i % 20))
+            for i in range(max(rows // 10, 1))
+        ], batch_size=2000)
+        Order.objects.bulk_create([
+            Order(user=rng.choice(users), order_id=f'explain-{tag}-{i}', preferred_delivery_time=now + timedelta(hours=rng.randrange(-500, 500)),
+                  payment_method='UPI', total_amount=Decimal('10.00'), status=rng.choice(STATUSES),
+                  delivery_notified_at=now if i % 4 else None)
+            for i in range(rows)
+        ], batch_size=2000)
+        Rating.objects.bulk_create([
+            Rating(user=rng.choice(users), product=rng.choice(products), score=rng.randrange(1, 6))
+            for _ in range(rows)
+        ], batch_size=2000, ignore_conflicts=True)
+        CartItem.objects.bulk_create([
+            CartItem(user=user, product=rng.choice(products), quantity=1) for user in users
+        ], batch_size=2000, ignore_conflicts=True)
+        StockReservation.objects.bulk_create([
+            StockReservation(user=user, product=rng.choice(products), quantity=1, expires_at=now + timedelta(minutes=rng.randrange(-60, 10)))
+            for user in users
+        ], batch_size=2000)
+        OutgoingEmail.objects.bulk_create([
+            OutgoingEmail(subject='Seeded', body='', recipients=[user.email], status='sent' if i % 10 else 'pending', sent_at=now)
+            for i, user in enumerate(users)
+        ], batch_size=2000)
+        self.stdout.write(f'Seeded {rows} orders and ratings, {len(users)} users and products')
+        return users[0], products[0]
+
+    def queries(self, user, product):
+        now = timezone.now()
+        return {
+            'home listing': listing_queryset().order_by('-created_at', '-pk')[:PAGE_SIZE],
+            'product detail': Product.objects.filter(pk=product.pk),
+            'cart': CartItem.objects.filter(user=user).select_related('product'),
+            'order lookup': Order.objects.filter(order_id='missing', user=user),
+            'order history': Order.objects.filter(user=user).order_by('-created_at'),
+            'admin orders by status': Order.objects.filter(status='Delivered').order_by('-created_at')[:100],
+            'admin orders by date': Order.objects.order_by('-created_at')[:100],
+            'verify email': CustomUser.objects.filter(verification_token='missing'),
+            'login by email': CustomUser.objects.filter(email=user.email),
+            'user ratings': Rating.objects.filter(user=user).values_list('product_id', 'score'),
+            'expired reservations': StockReservation.objects.filter(expires_at__lte=now),
+            'due deliveries': Order.objects.filter(status=NOTIFY_STATUS, preferred_delivery_time__lte=now,
+                                                   delivery_notified_at__isnull=True).order_by('preferred_delivery_time')[:500],
+            'pending mail': OutgoingEmail.objects.filter(status='pending', send_after__lte=now).order_by('send_after', 'pk')[:100],
+        }
+
+    def run(self, user, product):
+        failures = []
+        for label, queryset in self.queries(user, product).items():
+            plan = queryset.explain()
+            scans = sequential_scans(plan)
+            if scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'SEQ SCAN  {label} ({", ".join(scans)})'))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok        {label}'))
+        return failures
@@ -0,0 +1,45 @@
+import sys
+import time
+from datetime import date, datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from shop.exports import EXPORTS, FORMATS, export_lines
+
+class Command(BaseCommand):
+    help = 'Stream orders, order items or return requests as CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS), help='What to export.')
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write to; defaults to stdout.')
+        parser.add_argument('--since', type=date.fromisoformat, help='Only orders placed on or after this date (YYYY-MM-DD).')
+        parser.add_argument('--until', type=date.fromisoformat, help='Only orders placed before this date (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        model = EXPORTS[kind][0]
+        # Items are dated by their order; orders and returns by their own creation time
+        created = 'order__created_at' if kind == 'items' else 'created_at'
+        queryset = model.objects.all()
+        # Compare against datetimes rather than __date so the created_at indexes stay usable
+        if options['since']:
+            queryset = queryset.filter(**{f'{created}__gte': self.midnight(options['since'])})
+        if options['until']:
+            queryset = queryset.filter(**{f'{created}__lt': self.midnight(options['until'])})
+
+        started = time.perf_counter()
+        lines = 0
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for line in export_lines(kind, options['format'], queryset):
+                output.write(line)
+                lines += 1
+        finally:
+            if options['output']:
+                output.close()
+        if options['output']:
+            elapsed = time.perf_counter() - started
+            self.stderr.write(f'Wrote {lines} lines to {options["output"]} in {elapsed:.1f}s')
+
+    def midnight(self, day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
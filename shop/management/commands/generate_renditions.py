@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from shop.images import generate_renditions
+from shop.models import Product
+from shop.tasks import generate_product_renditions
+
+class Command(BaseCommand):
+    help = 'Generate resized image renditions for products that lack current ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that are already current.')
+        parser.add_argument('--async', action='store_true', dest='use_celery', help='Queue Celery tasks instead of rendering here.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('image', 'renditions')
+        pending = [product.pk for product in products.iterator()
+                   if options['force'] or product.renditions.get('source') != product.image.name]
+        for pk in pending:
+            if options['use_celery']:
+                generate_product_renditions.delay(pk, force=options['force'])
+            else:
+                generate_renditions(pk, force=options['force'])
+        self.stdout.write(f'{"Queued" if options["use_celery"] else "Rendered"} {len(pending)} products')
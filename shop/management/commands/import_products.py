@@ -0,0 +1,67 @@
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from shop.imports import CHUNK_SIZE, clean_row, read_rows, upsert_products
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSON Lines product feed into the catalog, upserting by SKU.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file. CSV needs a header row; columns: sku, name, description, price, stock, is_active, image.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows validated and written per statement.')
+        parser.add_argument('--max-errors', type=int, default=100, help='Stop after this many invalid rows.')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the feed.')
+        parser.add_argument('--no-images', action='store_true', help="Don't queue image downloads.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'jsonl')
+        self.options = options
+        self.started = time.perf_counter()
+        self.totals = {'rows': 0, 'created': 0, 'updated': 0, 'images': 0, 'invalid': 0}
+
+        chunk = {}
+        try:
+            for number, row in read_rows(options['path'], fmt):
+                self.totals['rows'] += 1
+                try:
+                    values, image = clean_row(row)
+                except ValidationError as e:
+                    self.invalid(number, e)
+                    continue
+                # A SKU repeated within a chunk would hit the same row twice in one upsert; the last one wins
+                chunk[values['sku']] = (values, image)
+                if len(chunk) >= options['chunk_size']:
+                    self.flush(chunk)
+                    chunk = {}
+            self.flush(chunk)
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        totals = self.totals
+        self.stdout.write(self.style.SUCCESS(
+            f'{totals["rows"]} rows in {self.elapsed():.1f}s ({self.rate():.0f} rows/s): '
+            f'{totals["created"]} created, {totals["updated"]} updated, {totals["invalid"]} invalid, '
+            f'{totals["images"]} images queued'
+        ))
+
+    def flush(self, chunk):
+        if not chunk or self.options['dry_run']:
+            return
+        created, updated, images = upsert_products(chunk, queue_images=not self.options['no_images'])
+        self.totals['created'] += created
+        self.totals['updated'] += updated
+        self.totals['images'] += images
+        self.stdout.write(f'{self.totals["rows"]} rows, {self.rate():.0f} rows/s')
+
+    def invalid(self, number, error):
+        self.totals['invalid'] += 1
+        self.stderr.write(f'Line {number}: {" ".join(error.messages)}')
+        if self.totals['invalid'] >= self.options['max_errors']:
+            raise CommandError(f'Stopped after {self.totals["invalid"]} invalid rows; earlier chunks were imported.')
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        return self.totals['rows'] / max(self.elapsed(), 1e-9)
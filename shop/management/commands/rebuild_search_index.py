@@ -0,0 +1,12 @@
+import time
+from django.core.management.base import BaseCommand
+from shop.search import get_search_engine
+
+class Command(BaseCommand):
+    help = 'Recompute the product search index (search_vector on PostgreSQL, in-memory otherwise).'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        get_search_engine().rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt in {elapsed:.2f}s.'))
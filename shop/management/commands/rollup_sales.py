@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from shop.models import Order
+from shop.rollups import rebuild_sales
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily per-product sales rollups for a range of days.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD); defaults to the first order.')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD); defaults to today.')
+        parser.add_argument('--step', type=int, default=7, help='Days rebuilt per transaction.')
+
+    def handle(self, *args, **options):
+        last = options['until'] or timezone.localdate()
+        first = options['since']
+        if first is None:
+            oldest = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if oldest is None:
+                raise CommandError('There are no orders to roll up.')
+            first = timezone.localdate(oldest)
+        if first > last:
+            raise CommandError('--since must not be after --until.')
+
+        # A step at a time, so a backfill of years never holds one huge transaction
+        rows = 0
+        day = first
+        while day <= last:
+            end = min(day + timedelta(days=options['step'] - 1), last)
+            rows += rebuild_sales(day, end)
+            day = end + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {(last - first).days + 1} days into {rows} rollup rows'))
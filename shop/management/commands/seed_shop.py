@@ -0,0 +1,157 @@
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import Address, CustomUser
+from shop.caching import invalidate_products
+from shop.models import CartItem, Order, OrderItem, Product, Rating
+from shop.search import get_search_engine
+from shop.storage import is_hashed, walk
+
+BRANDS = ['apple', 'samsung', 'adidas', 'nike', 'sony', 'lenovo', 'puma', 'oneplus', 'xiaomi', 'bosch']
+KINDS = ['phone', 'shoes', 'laptop', 'headphones', 'watch', 'jacket', 'camera', 'tablet', 'speaker', 'backpack']
+ADJECTIVES = ['pro', 'max', 'lite', 'ultra', 'classic', 'wireless', 'running', 'smart', 'mini', 'sport']
+CITIES = [('Mumbai', 'Maharashtra'), ('Bengaluru', 'Karnataka'), ('Delhi', 'Delhi'), ('Chennai', 'Tamil Nadu'), ('Pune', 'Maharashtra')]
+# Most orders are paid; some are left unpaid at the payment step, a few cancelled
+STATUSES = [('Confirmed', 70), ('confirmed', 15), ('Delivered', 10), ('Cancelled', 5)]
+SCORES = [1, 2, 3, 4, 5]
+SCORE_WEIGHTS = [5, 7, 15, 33, 40]
+
+class Command(BaseCommand):
+    help = 'Seed users, products, carts, orders and ratings with realistic distributions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--ratings', type=int, default=20000)
+        parser.add_argument('--password', default='seed-password', help='Password given to every seeded user.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, so runs are reproducible.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.run_id = uuid.uuid4().hex[:6]
+        with transaction.atomic():
+            users = self.seed_users(options['users'], options['password'], rng)
+            products = self.seed_products(options['products'], rng)
+            # Popularity follows a power law: a few products take most of the traffic
+            weights = [1 / (rank + 1) ** 1.1 for rank in range(len(products))]
+            self.seed_carts(users, products, weights, rng)
+            self.seed_orders(options['orders'], users, products, weights, rng)
+            self.seed_ratings(options['ratings'], users, products, weights, rng)
+        get_search_engine().rebuild()
+        invalidate_products([product.pk for product in products])
+        self.stdout.write(self.style.SUCCESS(f'Seeded run {self.run_id}; users log in as seed-{self.run_id}-<n> / {options["password"]}'))
+
+    def seed_users(self, count, password, rng):
+        # Hashing once keeps seeding fast; every user shares the same password
+        hashed = make_password(password)
+        phone_base = self.free_phone_block(count)
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'seed-{self.run_id}-{i}',
+                email=f'seed-{self.run_id}-{i}@example.com',
+                phone_number=self.phone_number(phone_base + i),
+                password=hashed,
+                is_verified=True,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        Address.objects.bulk_create([
+            Address(user=user, street=f'{rng.randrange(1, 400)} Main Road', city=city, state=state,
+                    zip_code=str(rng.randrange(100000, 999999)), country='India')
+            for user in users
+            for city, state in [rng.choice(CITIES)]
+        ], batch_size=2000)
+        self.stdout.write(f'{len(users)} users')
+        return users
+
+    def phone_number(self, n):
+        return f'+91{9 * 10 ** 9 + n}'
+
+    def free_phone_block(self, count):
+        # Phone numbers are unique, so like usernames they vary per run rather than with --seed
+        rng = random.Random(self.run_id)
+        for _ in range(10):
+            base = rng.randrange(10 ** 9 - count)
+            # Every number has the same length, so the block is a string range
+            taken = CustomUser.objects.filter(phone_number__gte=self.phone_number(base), phone_number__lte=self.phone_number(base + count - 1))
+            if not taken.exists():
+                return base
+        raise CommandError(f'No free block of {count} phone numbers found; try fewer --users.')
+
+    def seed_products(self, count, rng):
+        # Source images only: renditions are derived files, and the hash directories aren't images at all
+        images = sorted(name for name in walk('products') if not name.startswith('products/renditions/'))
+        # Once dedupe_product_images has run, the originals left behind are unreferenced copies
+        images = [name for name in images if is_hashed(name)] or images
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'{rng.choice(BRANDS).title()} {rng.choice(ADJECTIVES)} {rng.choice(KINDS)} {i}',
+                description=' '.join(rng.choice(BRANDS + KINDS + ADJECTIVES) for _ in range(rng.randrange(20, 80))),
+                # Prices are log-normal: many cheap items, a long tail of expensive ones
+                price=Decimal(min(round(rng.lognormvariate(7, 1), 2), 99999999)).quantize(Decimal('0.01')),
+                stock=0 if rng.random() < 0.05 else rng.randrange(1, 200),
+                image=rng.choice(images) if images and rng.random() < 0.8 else None,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        self.stdout.write(f'{len(products)} products')
+        return products
+
+    def seed_carts(self, users, products, weights, rng):
+        items = []
+        for user in users:
+            if rng.random() < 0.3:
+                for product in set(rng.choices(products, weights, k=rng.randrange(1, 6))):
+                    items.append(CartItem(user=user, product=product, quantity=rng.randrange(1, 4)))
+        CartItem.objects.bulk_create(items, batch_size=2000)
+        self.stdout.write(f'{len(items)} cart items')
+
+    def seed_orders(self, count, users, products, weights, rng):
+        now = timezone.now()
+        addresses = dict(Address.objects.filter(user__in=users).values_list('user_id', 'pk'))
+        statuses, status_weights = zip(*STATUSES)
+        orders, lines = [], []
+        for _ in range(count):
+            # Heavy buyers: a fifth of the users place most of the orders
+            user = users[int(len(users) * rng.random() ** 2)]
+            created = now - timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+            chosen = set(rng.choices(products, weights, k=min(int(rng.expovariate(0.6)) + 1, 8)))
+            items = [(product, rng.randrange(1, 4)) for product in chosen]
+            orders.append(Order(
+                user=user,
+                order_id=uuid.uuid4().hex[:20],
+                address_id=addresses.get(user.pk),
+                preferred_delivery_time=created + timedelta(days=rng.randrange(1, 8)),
+                payment_method=rng.choice(['Credit Card', 'Debit Card', 'UPI', 'Cash on Delivery']),
+                total_amount=sum(product.price * quantity for product, quantity in items),
+                status=rng.choices(statuses, status_weights)[0],
+                item_count=sum(quantity for _, quantity in items),
+                delivery_notified_at=created,
+            ))
+            lines.append((created, items))
+        orders = Order.objects.bulk_create(orders, batch_size=2000)
+        # created_at is auto_now_add, so it can only be backdated after the insert
+        for order, (created, _) in zip(orders, lines):
+            order.created_at = created
+        Order.objects.bulk_update(orders, ['created_at'], batch_size=2000)
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, product_name=product.name, quantity=quantity, price=product.price)
+            for order, (_, items) in zip(orders, lines)
+            for product, quantity in items
+        ], batch_size=2000)
+        self.stdout.write(f'{len(orders)} orders with {len(order_items)} items')
+
+    def seed_ratings(self, count, users, products, weights, rng):
+        ratings = {}
+        for _ in range(count):
+            user = users[int(len(users) * rng.random() ** 2)]
+            product = rng.choices(products, weights)[0]
+            ratings[user.pk, product.pk] = Rating(user=user, product=product, score=rng.choices(SCORES, SCORE_WEIGHTS)[0])
+        Rating.objects.bulk_create(ratings.values(), batch_size=2000)
+        self.stdout.write(f'{len(ratings)} ratings')
@@ -0,0 +1,15 @@
+import time
+from django.core.management.base import BaseCommand
+from shop.recommend import TOP_K, train_model
+
+class Command(BaseCommand):
+    help = 'Rebuild the item-item similarity table used by product recommendations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help='Neighbours kept per product.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = train_model(k=options['top_k'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} neighbour rows in {elapsed:.2f}s.'))
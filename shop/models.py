@@ -1,29 +1,88 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 import uuid
+from .storage import product_image_storage
 
 CustomUser = get_user_model()
 
+class ProductQuerySet(models.QuerySet):
+    def available(self):
+        return self.filter(is_active=True, stock__gt=0)
+
+    def restock(self, quantity):
+        from .caching import invalidate_products
+        pks = list(self.values_list('pk', flat=True))
+        updated = Product.objects.filter(pk__in=pks).update(stock=models.F('stock') + quantity)
+        invalidate_products(pks)
+        return updated
+
 class Product(models.Model):
+    # Supplier's stock keeping unit; the key catalog imports upsert on
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to='products/', null=True, blank=True)
+    image = models.ImageField(upload_to='products/', storage=product_image_storage, null=True, blank=True)
+    # Resized copies of image, written by shop.images
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # Where an imported image was fetched from, so unchanged feeds don't refetch it
+    image_source = models.CharField(max_length=500, blank=True, editable=False)
     stock = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Populated by shop.search on PostgreSQL; unused with the in-memory index
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listings only ever scan sellable rows, newest first
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_active=True, stock__gt=0),
+                name='product_available_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def in_stock(self):
+        return self.is_active and self.stock > 0
+
 class CartItem(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_user_product_cart_item'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+class StockReservation(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_exp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held for {self.user_id}"
+
 class Order(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='orders')
     order_id = models.CharField(max_length=20, unique=True, default=uuid.uuid4)
@@ -33,6 +92,25 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='Pending')
+    # Units across all lines, kept with the order so history lists needn't count items
+    item_count = models.PositiveIntegerField(default=0)
+    # Set when the out-for-delivery email is queued, so it is sent only once
+    delivery_notified_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Order history, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Admin status filter and date ordering
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            models.Index(fields=['-created_at'], name='order_created_idx'),
+            # The delivery sweeper only looks at orders still waiting for their notification
+            models.Index(
+                fields=['status', 'preferred_delivery_time'],
+                condition=models.Q(delivery_notified_at__isnull=True),
+                name='order_delivery_due_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.order_id} by {self.user.username}"
@@ -40,11 +118,13 @@ class Order(models.Model):
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
+    # The name at the time of purchase; survives renames and deleted products
+    product_name = models.CharField(max_length=255, blank=True)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} in Order {self.order.order_id}"
+        return f"{self.quantity} x {self.product_name} in Order {self.order.order_id}"
 
 class ReturnRequest(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='return_requests')
@@ -52,5 +132,89 @@ class ReturnRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='Pending')
 
+    class Meta:
+        indexes = [
+            # Sales rollups read a day's returns at a time
+            models.Index(fields=['created_at'], name='return_request_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Return for Order {self.order.order_id}"
+
+class Rating(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='ratings')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='ratings')
+    score = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_user_product_rating'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} rated {self.product_id}: {self.score}"
+
+class ProductSimilarity(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', '-score'], name='similarity_product_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} ~ {self.neighbour_id} ({self.score:.3f})"
+
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Earliest time a worker may pick the message up; pushed forward while a
+    # worker holds it and on every failed attempt
+    send_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['send_after'], condition=models.Q(status='pending'), name='outgoing_email_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
+
+class ProductDailySales(models.Model):
+    """Units, revenue and returns of one product on one day, maintained by shop.rollups."""
+    day = models.DateField()
+    # Null for products that have since been deleted; the name is kept for reports
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    product_name = models.CharField(max_length=255)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    returned_units = models.PositiveIntegerField(default=0)
+    returned_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='product_daily_sales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'day'], name='product_daily_sales_idx'),
+        ]
+
     def __str__(self):
-        return f"Return for Order {self.order.order_id}"
\ No newline at end of file
+        return f"{self.product_name} on {self.day}: {self.units} units"
@@ -0,0 +1,141 @@
+import uuid
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, PositiveIntegerField, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import CartItem, Order, OrderItem, Product, StockReservation
+from .caching import invalidate_products
+from .pagination import keyset_page
+
+class OutOfStock(Exception):
+    def __init__(self, product):
+        super().__init__(f'{product.name} is out of stock.')
+        self.product = product
+
+def decrement_stock(quantities, user=None):
+    """Take ``quantities`` ({product: n}) off stock in one conditional UPDATE.
+
+    Only active rows that still hold enough stock match the WHERE clause,
+    so two concurrent checkouts can never both take the last unit, and a
+    product retired after it was added to the cart can't be sold. Units held by
+    other shoppers' active reservations don't count as stock for ``user``.
+    Raises OutOfStock for the first product that fell short; callers must
+    run this inside a transaction so the partial update is rolled back.
+    """
+    held_by_others = Coalesce(
+        Subquery(
+            StockReservation.objects
+            .filter(product=OuterRef('pk'), expires_at__gt=timezone.now())
+            .exclude(user=user)
+            .values('product')
+            .annotate(total=Sum('quantity'))
+            .values('total')
+        ),
+        0,
+        output_field=IntegerField(),
+    )
+    enough = Q()
+    for product, quantity in quantities.items():
+        enough |= Q(pk=product.pk, is_active=True, stock__gte=held_by_others + quantity)
+    new_stock = Case(
+        *[When(pk=product.pk, then=F('stock') - quantity) for product, quantity in quantities.items()],
+        default=F('stock'),
+        output_field=PositiveIntegerField(),
+    )
+    updated = Product.objects.filter(enough).update(stock=new_stock)
+    if updated != len(quantities):
+        free = dict(Product.objects.filter(pk__in=[product.pk for product in quantities], is_active=True)
+                    .annotate(free=F('stock') - held_by_others).values_list('pk', 'free'))
+        short = [product for product, quantity in quantities.items() if free.get(product.pk, 0) < quantity]
+        raise OutOfStock(short[0] if short else next(iter(quantities)))
+
+def place_order(user, cart, address, preferred_delivery_time):
+    """Turn ``cart`` into a confirmed order in a single transaction.
+
+    Stock is decremented atomically, order items are bulk inserted and the
+    stored cart rows are removed with one DELETE, so the round trips stay
+    constant regardless of cart size. Clearing the session cart is left to
+    the caller.
+    """
+    items = list(cart)
+    if not items:
+        raise ValueError('Cannot place an order for an empty cart.')
+    quantities = Counter()
+    for item in items:
+        quantities[item.product] += item.quantity
+
+    taken = hold_cart(user, quantities)
+    try:
+        return create_order(user, cart, items, quantities, address, preferred_delivery_time)
+    except OutOfStock:
+        from .reservations import give_back
+        for product_id, quantity in taken:
+            give_back(product_id, quantity)
+        raise
+
+def hold_cart(user, quantities):
+    """Make sure ``user`` holds every unit of ``quantities`` before selling it.
+
+    Lines without an active hold, e.g. because it expired or the cart grew
+    after checkout opened, take the missing units from the availability
+    counter now. Raises OutOfStock, giving those units back, when that
+    fails. Returns the units taken.
+    """
+    from .reservations import give_back, seed_counters, take
+    held = dict(
+        StockReservation.objects.filter(user=user, expires_at__gt=timezone.now())
+        .values('product').annotate(total=Sum('quantity')).values_list('product', 'total')
+    )
+    short = {product: quantity - held.get(product.pk, 0) for product, quantity in quantities.items()}
+    short = {product: missing for product, missing in short.items() if missing > 0}
+    if short:
+        seed_counters([product.pk for product in short])
+    taken = []
+    for product, missing in short.items():
+        if not take(product.pk, missing):
+            for product_id, units in taken:
+                give_back(product_id, units)
+            raise OutOfStock(product)
+        taken.append((product.pk, missing))
+    return taken
+
+def create_order(user, cart, items, quantities, address, preferred_delivery_time):
+    with transaction.atomic():
+        decrement_stock(quantities, user)
+        order = Order.objects.create(
+            user=user,
+            order_id=uuid.uuid4().hex[:20],
+            address=address,
+            preferred_delivery_time=preferred_delivery_time,
+            payment_method='Pending',
+            total_amount=cart.total,
+            status='confirmed',
+            item_count=sum(quantities.values()),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item.product, product_name=item.product.name,
+                      quantity=item.quantity, price=item.product.price)
+            for item in items
+        ])
+        CartItem.objects.filter(user=user).delete()
+        # The held units are now sold, so availability counters stay unchanged.
+        # Holds on anything else are left to expire and hand their units back.
+        product_ids = [product.pk for product in quantities]
+        StockReservation.objects.filter(user=user, product_id__in=product_ids).delete()
+        # Stock changed through update(), which sends no signals. Listings
+        # and search only show products in stock, so they change only when
+        # a product sells out.
+        sold_out = Product.objects.filter(pk__in=product_ids, stock=0).exists()
+        transaction.on_commit(lambda: invalidate_products(product_ids, catalog=sold_out))
+    return order
+
+def order_history(user, cursor=None, page_size=10):
+    """Newest-first page of ``user``'s orders with their items, plus the next cursor.
+
+    Items are prefetched and carry their own product name, and the order
+    carries its item count, so a page costs two queries however many
+    orders or lines it holds.
+    """
+    orders = Order.objects.filter(user=user).prefetch_related('items')
+    return keyset_page(orders, cursor, page_size)
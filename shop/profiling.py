@@ -0,0 +1,230 @@
+import cProfile
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from .caching import request_cache_stats
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+METRICS = {
+    'request_duration_seconds': ('Wall time per request', SECONDS_BUCKETS),
+    'request_db_seconds': ('Time spent in SQL per request', SECONDS_BUCKETS),
+    'request_queries': ('SQL queries per request', QUERY_BUCKETS),
+    'request_template_seconds': ('Template render time per request', SECONDS_BUCKETS),
+}
+
+# Aggregated per process, like shop.caching.CACHE_STATS
+HISTOGRAMS = {}
+CACHE_RESULTS = Counter()
+_lock = threading.Lock()
+# From Python 3.12 only one cProfile profiler can be active per process
+_profiler_lock = threading.Lock()
+
+# Per request; context variables follow a request into sync_to_async threads
+_template_time = ContextVar('template_time', default=None)
+_request_profile = ContextVar('request_profile', default=None)
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timer = _template_time.get()
+        if timer is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer[0] += time.perf_counter() - started
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for ProfilingMiddleware.
+
+    Only templates loaded through the backend are timed, i.e. top-level
+    renders, so includes aren't counted twice.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+
+def time_query(execute, sql, params, many, context):
+    profile = _request_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_time += time.perf_counter() - started
+
+def install_query_timer(sender, connection, **kwargs):
+    # Connected to connection_created, so every thread's connection is covered, including those async views use
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+def record(view, duration, profile, template_time, cache_tally):
+    observations = {
+        'request_duration_seconds': duration,
+        'request_db_seconds': profile.db_time,
+        'request_queries': profile.queries,
+        'request_template_seconds': template_time,
+    }
+    with _lock:
+        for metric, value in observations.items():
+            if (metric, view) not in HISTOGRAMS:
+                HISTOGRAMS[metric, view] = Histogram(METRICS[metric][1])
+            HISTOGRAMS[metric, view].observe(value)
+        for result, count in cache_tally.items():
+            CACHE_RESULTS[view, result] += count
+
+def dump_profile(profiler, view, duration):
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{view.replace(":", "-")}-{duration * 1000:.0f}ms.prof'
+    profiler.dump_stats(os.path.join(directory, name))
+
+def start_profiler():
+    """Start a cProfile profiler, or return None if one is already running."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another tool, e.g. a debugger, holds the profiling hook
+        _profiler_lock.release()
+        return None
+    return profiler
+
+def stop_profiler(profiler):
+    profiler.disable()
+    _profiler_lock.release()
+
+class ProfilingMiddleware:
+    """Record wall time, SQL, template and cache figures for every request.
+
+    Figures are aggregated per view into histograms, served in Prometheus
+    text format by shop.views.metrics. SQL is timed by a wrapper on every
+    connection and templates by TimedDjangoTemplates, both reporting to
+    the current request through context variables. When
+    PROFILE_SLOW_REQUESTS_MS is set, sync requests also run under cProfile
+    and the stats of those slower than the threshold are written to
+    PROFILE_DIR; this costs noticeably more, so enable it only while
+    investigating. One request is profiled at a time; requests that arrive
+    meanwhile, and async ones, whose coroutines cProfile can't follow, are
+    only measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        threshold = settings.PROFILE_SLOW_REQUESTS_MS
+        profiler = start_profiler() if threshold else None
+        tokens = self.start()
+        try:
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    stop_profiler(profiler)
+        finally:
+            figures = self.finish(tokens)
+        view = self.record(request, figures)
+        if profiler and figures[0] * 1000 >= threshold:
+            dump_profile(profiler, view, figures[0])
+        return response
+
+    async def __acall__(self, request):
+        tokens = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            figures = self.finish(tokens)
+        self.record(request, figures)
+        return response
+
+    def start(self):
+        return (
+            time.perf_counter(),
+            _request_profile.set(RequestProfile()),
+            _template_time.set([0]),
+            request_cache_stats.set(Counter()),
+        )
+
+    def finish(self, tokens):
+        started, profile_token, template_token, cache_token = tokens
+        duration = time.perf_counter() - started
+        figures = (duration, _request_profile.get(), _template_time.get()[0], request_cache_stats.get())
+        _request_profile.reset(profile_token)
+        _template_time.reset(template_token)
+        request_cache_stats.reset(cache_token)
+        return figures
+
+    def record(self, request, figures):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        record(view, *figures)
+        return view
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        for metric, (description, _) in METRICS.items():
+            lines.append(f'# HELP shop_{metric} {description}')
+            lines.append(f'# TYPE shop_{metric} histogram')
+            for (name, view), histogram in sorted(HISTOGRAMS.items()):
+                if name != metric:
+                    continue
+                for bound, total in histogram.cumulative():
+                    lines.append(f'shop_{metric}_bucket{{view="{view}",le="{bound}"}} {total}')
+                lines.append(f'shop_{metric}_sum{{view="{view}"}} {histogram.sum:.6f}')
+                lines.append(f'shop_{metric}_count{{view="{view}"}} {histogram.count}')
+        lines.append('# HELP shop_cache_requests_total Cache lookups by view and result')
+        lines.append('# TYPE shop_cache_requests_total counter')
+        for (view, result), count in sorted(CACHE_RESULTS.items()):
+            lines.append(f'shop_cache_requests_total{{view="{view}",result="{result}"}} {count}')
+    return '\n'.join(lines) + '\n'
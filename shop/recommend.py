@@ -1,21 +1,197 @@
-from surprise import Dataset, Reader, KNNBasic
-from surprise.model_selection import train_test_split
-from .models import Rating
+import random
+import numpy as np
+from scipy import sparse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from .models import Product, OrderItem, Rating, ProductSimilarity
+
+TOP_K = 20
+MIN_SIMILARITY = 1e-6
+
+PERSONAL_TTL = 15 * 60
+POPULAR_TTL = 60 * 60
+PRODUCT_POOL_TTL = 10 * 60
+POPULAR_LIMIT = 50
+# Available ids kept for the random fill; a window of the table, not all of it
+POOL_SIZE = 500
+
+def build_similarity_matrix(user_ids, product_ids, scores):
+    """Item-item cosine similarity from parallel arrays of ratings.
+
+    Returns the product ids indexing the matrix and a sparse CSR matrix of
+    similarities with the diagonal removed.
+    """
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    products, product_index = np.unique(product_ids, return_inverse=True)
+    ratings = sparse.csr_matrix(
+        (np.asarray(scores, dtype=np.float64), (user_index, product_index)),
+        shape=(len(users), len(products)),
+    )
+    norms = np.sqrt(np.asarray(ratings.multiply(ratings).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = ratings @ sparse.diags(1.0 / norms)
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    return products, similarity
+
+def top_neighbours(products, similarity, k=TOP_K):
+    """Yield (product_id, neighbour_id, score) for the k most similar items of each product."""
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if start == end:
+            continue
+        columns = similarity.indices[start:end]
+        values = similarity.data[start:end]
+        if len(values) > k:
+            keep = np.argpartition(values, -k)[-k:]
+            columns, values = columns[keep], values[keep]
+        for column, value in zip(columns, values):
+            if value > MIN_SIMILARITY:
+                yield int(products[row]), int(products[column]), float(value)
+
+def train_model(k=TOP_K, batch_size=5000):
+    """Rebuild the persisted top-k neighbour table from all ratings.
+
+    Meant to run offline (management command or Celery task), never on the
+    request path. Returns the number of neighbour rows written.
+    """
+    rows = np.array(list(Rating.objects.values_list('user_id', 'product_id', 'score')), dtype=np.int64)
+    neighbours = []
+    if len(rows):
+        products, similarity = build_similarity_matrix(rows[:, 0], rows[:, 1], rows[:, 2])
+        neighbours = [
+            ProductSimilarity(product_id=product_id, neighbour_id=neighbour_id, score=score)
+            for product_id, neighbour_id, score in top_neighbours(products, similarity, k)
+        ]
+    with transaction.atomic():
+        ProductSimilarity.objects.all().delete()
+        ProductSimilarity.objects.bulk_create(neighbours, batch_size=batch_size)
+    return len(neighbours)
 
 def get_recommendations(user_id, n=5):
-    ratings = Rating.objects.all().values('user_id', 'product_id', 'score')
-    if not ratings:
+    rated = Rating.objects.filter(user_id=user_id).values_list('product_id', 'score')
+    rated = np.array(list(rated), dtype=np.int64).reshape(-1, 2)
+    if not len(rated):
+        return []
+    neighbours = ProductSimilarity.objects.filter(product_id__in=rated[:, 0].tolist())
+    neighbours = list(neighbours.values_list('product_id', 'neighbour_id', 'score'))
+    if not neighbours:
         return []
-    import pandas as pd
-    df = pd.DataFrame(ratings)
-    reader = Reader(rating_scale=(1, 5))
-    data = Dataset.load_from_df(df[['user_id', 'product_id', 'score']], reader)
-    trainset, testset = train_test_split(data, test_size=0.25)
-    algo = KNNBasic(sim_options={'user_based': False})
-    algo.fit(trainset)
-    user_ratings = df[df['user_id'] == user_id]['product_id'].tolist()
-    all_products = df['product_id'].unique()
-    predictions = [algo.predict(user_id, pid) for pid in all_products if pid not in user_ratings]
-    predictions.sort(key=lambda x: x.est, reverse=True)
-    top_ids = [pred.iid for pred in predictions[:n]]
-    return top_ids
\ No newline at end of file
+    sources = np.array([row[0] for row in neighbours], dtype=np.int64)
+    candidates = np.array([row[1] for row in neighbours], dtype=np.int64)
+    weights = np.array([row[2] for row in neighbours], dtype=np.float64)
+
+    # Weighted average of the user's own scores over each candidate's rated neighbours.
+    order = np.argsort(rated[:, 0])
+    user_scores = rated[order, 1][np.searchsorted(rated[order, 0], sources)]
+    ids, inverse = np.unique(candidates, return_inverse=True)
+    numerator = np.bincount(inverse, weights=weights * user_scores)
+    denominator = np.bincount(inverse, weights=weights)
+    estimates = numerator / np.maximum(denominator, MIN_SIMILARITY)
+    estimates[np.isin(ids, rated[:, 0])] = -np.inf
+
+    top = np.argsort(-estimates, kind='stable')[:n]
+    top = top[np.isfinite(estimates[top])]
+    return ids[top].tolist()
+
+def personalized_product_ids(user_id, n):
+    key = f'recs:user:{user_id}:{n}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = get_recommendations(user_id, n)
+        cache.set(key, ids, PERSONAL_TTL)
+    return ids
+
+def popular_product_ids():
+    ids = cache.get('recs:popular')
+    if ids is None:
+        ids = list(
+            OrderItem.objects.filter(product__isnull=False)
+            .values('product')
+            .annotate(units=Sum('quantity'))
+            .order_by('-units')
+            .values_list('product', flat=True)[:POPULAR_LIMIT]
+        )
+        cache.set('recs:popular', ids, POPULAR_TTL)
+    return ids
+
+def co_purchased_product_ids(product_id):
+    key = f'recs:copurchase:{product_id}'
+    ids = cache.get(key)
+    if ids is None:
+        orders = OrderItem.objects.filter(product_id=product_id).values('order')
+        ids = list(
+            OrderItem.objects.filter(order__in=orders, product__isnull=False)
+            .exclude(product_id=product_id)
+            .values('product')
+            .annotate(orders=Count('order', distinct=True))
+            .order_by('-orders')
+            .values_list('product', flat=True)[:POPULAR_LIMIT]
+        )
+        cache.set(key, ids, POPULAR_TTL)
+    return ids
+
+def product_pool(size=POOL_SIZE):
+    """Up to ``size`` available ids read off the primary key index from a random starting point."""
+    bounds = Product.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    start = random.randint(bounds['low'], bounds['high'])
+    available = Product.objects.available().order_by('pk').values_list('pk', flat=True)
+    pool = list(available.filter(pk__gte=start)[:size])
+    if len(pool) < size:
+        # Wrap around to the start of the table
+        pool += available.filter(pk__lt=start)[:size - len(pool)]
+    return pool
+
+def random_product_ids(k):
+    # Sample from a cached id pool instead of ORDER BY RANDOM() over the table
+    pool = cache.get('recs:pool')
+    if pool is None:
+        pool = product_pool()
+        cache.set('recs:pool', pool, PRODUCT_POOL_TTL)
+    return random.sample(pool, min(k, len(pool)))
+
+def refresh_cached_recommendations():
+    cache.delete_many(['recs:popular', 'recs:pool'])
+    popular_product_ids()
+    random_product_ids(0)
+
+def recommend_products(user=None, n=4, related_to=None, exclude=()):
+    """Products to show as recommendations, best source first.
+
+    Personalised neighbours from the ratings model come first, then items
+    bought together with ``related_to``, then overall best sellers, and a
+    random sample fills whatever is left, e.g. for cold-start users or
+    once the best sellers have sold out. Candidates are checked for
+    availability before the first ``n`` are taken.
+    """
+    excluded = set(exclude)
+    if related_to is not None:
+        excluded.add(related_to)
+    sources = []
+    if user is not None and user.is_authenticated:
+        sources.append(personalized_product_ids(user.pk, n + len(excluded)))
+    if related_to is not None:
+        sources.append(co_purchased_product_ids(related_to))
+    sources.append(popular_product_ids())
+
+    picked = []
+    for ids in sources:
+        for pid in ids:
+            if pid not in excluded and pid not in picked:
+                picked.append(pid)
+
+    # At most a few hundred ids, looked up by primary key
+    products = Product.objects.available().in_bulk(picked)
+    recommended = [products[pid] for pid in picked if pid in products][:n]
+    missing = n - len(recommended)
+    if missing > 0:
+        seen = excluded.union(picked)
+        # The pool may be a few minutes stale, so draw extra in case some have sold out
+        filler = [pid for pid in random_product_ids(2 * missing + len(seen)) if pid not in seen]
+        products = Product.objects.available().in_bulk(filler[:2 * missing])
+        recommended += [products[pid] for pid in filler if pid in products][:missing]
+    return recommended
\ No newline at end of file
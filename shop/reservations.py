@@ -0,0 +1,108 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Product, StockReservation
+from .orders import OutOfStock
+
+RESERVATION_TTL = timedelta(minutes=10)
+COUNTER_TTL = 60
+
+def counter_key(product_id):
+    return f'stock:available:{product_id}'
+
+def available_from_db(product_ids):
+    """Stock minus active holds for each product, in one query; nothing for retired products."""
+    active = Q(reservations__expires_at__gt=timezone.now())
+    rows = (Product.objects.filter(pk__in=product_ids)
+            .annotate(reserved=Coalesce(Sum('reservations__quantity', filter=active), 0))
+            .values_list('pk', 'is_active', 'stock', 'reserved'))
+    return {pk: stock - reserved if is_active else 0 for pk, is_active, stock, reserved in rows}
+
+def seed_counters(product_ids):
+    """Seed the missing availability counters of ``product_ids`` with one query."""
+    try:
+        keys = {product_id: counter_key(product_id) for product_id in product_ids}
+        found = cache.get_many(keys.values())
+        missing = [product_id for product_id, key in keys.items() if key not in found]
+        if missing:
+            for product_id, available in available_from_db(missing).items():
+                cache.add(keys[product_id], available, COUNTER_TTL)
+    except Exception:
+        # Cache unreachable; take() falls back to the database
+        pass
+
+def take(product_id, quantity):
+    """Claim ``quantity`` units from the product's availability counter.
+
+    The counter lives in the cache and is decremented atomically, so a hot
+    product doesn't serialise every checkout on its database row. A missing
+    or expired counter is re-seeded from the database; the short TTL bounds
+    any drift between the two. The final say stays with the conditional
+    stock UPDATE in place_order.
+    """
+    key = counter_key(product_id)
+    try:
+        try:
+            remaining = cache.decr(key, quantity)
+        except ValueError:
+            cache.add(key, available_from_db([product_id]).get(product_id, 0), COUNTER_TTL)
+            remaining = cache.decr(key, quantity)
+    except Exception:
+        # Cache unreachable: fall back to checking the database directly
+        return available_from_db([product_id]).get(product_id, 0) >= quantity
+    if remaining < 0:
+        give_back(product_id, quantity)
+        return False
+    return True
+
+def give_back(product_id, quantity):
+    try:
+        cache.incr(counter_key(product_id), quantity)
+    except Exception:
+        # Counter expired or cache unreachable; it is re-seeded from the database
+        pass
+
+def release_reservations(user):
+    held = list(StockReservation.objects.filter(user=user).values_list('pk', 'product_id', 'quantity'))
+    if held:
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in held]).delete()
+        for _, product_id, quantity in held:
+            give_back(product_id, quantity)
+
+def reserve_cart(user, cart):
+    """Hold stock for every line of ``cart`` until RESERVATION_TTL runs out.
+
+    Replaces any earlier holds of the user. Raises OutOfStock, holding
+    nothing, when a product can't cover its line.
+    """
+    release_reservations(user)
+    # Seed cold counters together rather than once per line in take()
+    seed_counters([item.product_id for item in cart])
+    taken = []
+    for item in cart:
+        if not take(item.product_id, item.quantity):
+            for product_id, quantity in taken:
+                give_back(product_id, quantity)
+            raise OutOfStock(item.product)
+        taken.append((item.product_id, item.quantity))
+    expires_at = timezone.now() + RESERVATION_TTL
+    return StockReservation.objects.bulk_create([
+        StockReservation(user=user, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in taken
+    ])
+
+def release_expired():
+    expired = list(StockReservation.objects.filter(expires_at__lte=timezone.now())
+                   .values_list('pk', 'product_id', 'quantity'))
+    if not expired:
+        return 0
+    deleted, _ = StockReservation.objects.filter(pk__in=[pk for pk, _, _ in expired]).delete()
+    if deleted != len(expired):
+        # Raced with checkout or another sweeper; let the counters re-seed instead
+        cache.delete_many([counter_key(product_id) for _, product_id, _ in expired])
+    else:
+        for _, product_id, quantity in expired:
+            give_back(product_id, quantity)
+    return deleted
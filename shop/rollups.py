@@ -0,0 +1,107 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, CharField, Count, DecimalField, ExpressionWrapper, F, Max, Min, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import OrderItem, ProductDailySales, ReturnRequest
+
+# Orders that count as sales: paid for and not cancelled
+SOLD_STATUSES = ['Confirmed', 'Shipped', 'Delivered']
+TOTALS = {
+    'units': Sum('units'),
+    'revenue': Sum('revenue'),
+    'returned_units': Sum('returned_units'),
+    'returned_value': Sum('returned_value'),
+}
+LINE_TOTAL = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+# Deleted products all have a null product, so they are told apart by the name they sold under
+DELETED_NAME = Case(When(product__isnull=True, then=F('product_name')), default=Value(''), output_field=CharField())
+
+def midnight(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+def sales_rows(start, end):
+    # Sales are dated by the order, which order_created_idx finds by range
+    sales = (
+        OrderItem.objects
+        .filter(order__created_at__gte=start, order__created_at__lt=end, order__status__in=SOLD_STATUSES)
+        .annotate(day=TruncDate('order__created_at'), deleted_name=DELETED_NAME)
+        .values('day', 'product_id', 'deleted_name')
+        .annotate(
+            name=Max('product_name'),
+            orders=Count('order_id', distinct=True),
+            units=Sum('quantity'),
+            revenue=Sum(LINE_TOTAL),
+        )
+        .order_by()
+    )
+    rows = {}
+    for row in sales:
+        rows[row['day'], row['product_id'], row['deleted_name']] = ProductDailySales(
+            day=row['day'], product_id=row['product_id'], product_name=row['name'],
+            orders=row['orders'], units=row['units'], revenue=row['revenue'],
+        )
+    return rows
+
+def add_returns(rows, start, end):
+    """Count returned units against the day of each order's first return request.
+
+    Rejected requests don't count, and an order with several requests is
+    only counted once, on the day of the earliest.
+    """
+    recent = ReturnRequest.objects.filter(created_at__gte=start, created_at__lt=end).values('order')
+    first_returns = (
+        ReturnRequest.objects.filter(order__in=recent).exclude(status='Rejected')
+        .values('order').annotate(first=Min('created_at')).order_by()
+    )
+    returned_on = {
+        row['order']: timezone.localdate(row['first'])
+        for row in first_returns if start <= row['first'] < end
+    }
+    returned = defaultdict(lambda: [0, Decimal(0), ''])
+    items = OrderItem.objects.filter(order_id__in=list(returned_on)).values_list('order_id', 'product_id', 'product_name', 'quantity', 'price')
+    for order_id, product_id, name, quantity, price in items:
+        totals = returned[returned_on[order_id], product_id, '' if product_id else name]
+        totals[0] += quantity
+        totals[1] += quantity * price
+        totals[2] = name
+    for (day, product_id, deleted_name), (units, value, name) in returned.items():
+        row = rows.get((day, product_id, deleted_name))
+        if row is None:
+            row = rows[day, product_id, deleted_name] = ProductDailySales(day=day, product_id=product_id, product_name=name)
+        row.returned_units = units
+        row.returned_value = value
+
+def rebuild_sales(first, last):
+    """Recompute ProductDailySales for the days ``first`` to ``last`` inclusive.
+
+    The days are rebuilt from scratch and swapped in within one
+    transaction, so running this again, or over an overlapping range, is
+    safe. Only orders and returns from the range are read.
+    """
+    start, end = midnight(first), midnight(last + timedelta(days=1))
+    rows = sales_rows(start, end)
+    add_returns(rows, start, end)
+    with transaction.atomic():
+        ProductDailySales.objects.filter(day__gte=first, day__lte=last).delete()
+        ProductDailySales.objects.bulk_create(rows.values(), batch_size=2000)
+    return len(rows)
+
+def rebuild_recent_sales(days):
+    # Today and the days before it; new orders and returns always land in the current day
+    today = timezone.localdate()
+    return rebuild_sales(today - timedelta(days=days - 1), today)
+
+def sales_summary(first, last, top=10):
+    """Daily totals and top products between ``first`` and ``last``, read from the rollups only."""
+    rollups = ProductDailySales.objects.filter(day__gte=first, day__lte=last).order_by()
+    daily = list(rollups.values('day').annotate(**TOTALS).order_by('day'))
+    products = list(
+        rollups.annotate(deleted_name=DELETED_NAME).values('product_id', 'deleted_name')
+        .annotate(name=Max('product_name'), **TOTALS).order_by('-revenue')[:top]
+    )
+    for product in products:
+        del product['deleted_name']
+    return daily, products
@@ -0,0 +1,262 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, connections
+from django.db.models import F
+from .models import Product
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset(['a', 'an', 'and', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'])
+NAME_WEIGHT = 3.0
+MAX_PREFIX_EXPANSION = 50
+# Ranked matches checked for availability per wanted result; grows when too many have sold out
+OVERFETCH = 4
+SEARCH_CONFIG = 'english'
+
+def tokenize(text, prefix=False):
+    """Lowercase word tokens without stop words.
+
+    With ``prefix`` the last token is kept whatever it is, since a query
+    being typed may end in the start of a longer word ("on" for "oneplus").
+    """
+    tokens = TOKEN_RE.findall((text or '').lower())
+    last = tokens.pop() if prefix and tokens else None
+    tokens = [token for token in tokens if token not in STOP_WORDS]
+    if last is not None:
+        tokens.append(last)
+    return tokens
+
+class MemorySearchIndex:
+    """In-process inverted index over product names and descriptions.
+
+    Used in development (SQLite). Ranks with BM25, weighting name matches
+    above description matches, and treats the last query term as a prefix.
+    The index is built lazily on first use and kept current by the product
+    signals of this process only. Like the PostgreSQL engine it only
+    returns available products; that is checked against the database for
+    each query, as stock changes through update() send no signals. Only
+    the top-ranked matches are checked, a few times more than the page
+    needs, so a short prefix matching most of the catalogue stays cheap.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self.postings = defaultdict(dict)
+        self.doc_tokens = {}
+        self.lengths = {}
+        self.total_length = 0.0
+        self.names = {}
+        self.sorted_tokens = None
+
+    def ensure_built(self):
+        if not self.built:
+            self.rebuild()
+
+    def rebuild(self):
+        with self.lock:
+            self.postings = defaultdict(dict)
+            self.doc_tokens = {}
+            self.lengths = {}
+            self.total_length = 0.0
+            self.names = {}
+            products = Product.objects.values_list('id', 'name', 'description')
+            for pk, name, description in products.iterator(chunk_size=2000):
+                self._add(pk, name, description)
+            self.sorted_tokens = None
+            self.built = True
+
+    def _add(self, pk, name, description):
+        weights = defaultdict(float)
+        for token in tokenize(name):
+            weights[token] += NAME_WEIGHT
+        for token in tokenize(description):
+            weights[token] += 1.0
+        for token, weight in weights.items():
+            self.postings[token][pk] = weight
+        self.doc_tokens[pk] = list(weights)
+        self.lengths[pk] = sum(weights.values())
+        self.total_length += self.lengths[pk]
+        self.names[pk] = name
+
+    def _remove(self, pk):
+        for token in self.doc_tokens.pop(pk, ()):
+            docs = self.postings[token]
+            docs.pop(pk, None)
+            if not docs:
+                del self.postings[token]
+        self.total_length -= self.lengths.pop(pk, 0.0)
+        self.names.pop(pk, None)
+
+    def index_product(self, product):
+        if not self.built:
+            return
+        with self.lock:
+            self._remove(product.pk)
+            self._add(product.pk, product.name, product.description)
+            self.sorted_tokens = None
+
+    def index_products(self, pks):
+        # For bulk writes, which send no post_save
+        if not self.built:
+            return
+        products = Product.objects.filter(pk__in=pks).values_list('id', 'name', 'description')
+        with self.lock:
+            for pk, name, description in products:
+                self._remove(pk)
+                self._add(pk, name, description)
+            self.sorted_tokens = None
+
+    def remove_product(self, pk):
+        if not self.built:
+            return
+        with self.lock:
+            self._remove(pk)
+            self.sorted_tokens = None
+
+    def expand_prefix(self, prefix):
+        if self.sorted_tokens is None:
+            self.sorted_tokens = sorted(self.postings)
+        start = bisect_left(self.sorted_tokens, prefix)
+        matches = []
+        for token in self.sorted_tokens[start:start + MAX_PREFIX_EXPANSION]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def _scores(self, query):
+        terms = tokenize(query, prefix=True)
+        if not terms:
+            return {}
+        # Each term maps to the postings of every token it matches (the last one as a prefix)
+        term_postings = [[self.postings[term]] if term in self.postings else [] for term in terms[:-1]]
+        prefix_postings = [self.postings[token] for token in self.expand_prefix(terms[-1])]
+        if len(terms) > 1 and terms[-1] in STOP_WORDS:
+            # Probably a whole stop word ("case for"): it only boosts documents it matches
+            optional = prefix_postings
+        else:
+            term_postings.append(prefix_postings)
+            optional = []
+        if not all(term_postings):
+            return {}
+
+        # Intersect from the rarest term so only matching documents get scored
+        term_postings.sort(key=lambda postings: sum(len(docs) for docs in postings))
+        candidates = set().union(*term_postings[0])
+        for postings in term_postings[1:]:
+            candidates = {pk for pk in candidates if any(pk in docs for docs in postings)}
+            if not candidates:
+                return {}
+
+        total = len(self.lengths)
+        average_length = (self.total_length / total) if total else 1.0
+        scores = dict.fromkeys(candidates, 0.0)
+        for postings in term_postings + [optional]:
+            for docs in postings:
+                idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                for pk in candidates:
+                    weight = docs.get(pk)
+                    if weight:
+                        norm = self.k1 * (1 - self.b + self.b * self.lengths[pk] / average_length)
+                        scores[pk] += idf * weight * (self.k1 + 1) / (weight + norm)
+        return scores
+
+    def search(self, query, offset=0, limit=24):
+        self.ensure_built()
+        with self.lock:
+            scores = self._scores(query)
+        wanted = offset + limit
+        size = wanted * OVERFETCH
+        checked, results = 0, []
+        # Filter before paging, so sold-out matches don't leave pages empty
+        while True:
+            ranked = heapq.nsmallest(size, scores, key=lambda pk: (-scores[pk], -pk))
+            batch = ranked[checked:]
+            available = set(Product.objects.available().filter(pk__in=batch).values_list('pk', flat=True))
+            results.extend(pk for pk in batch if pk in available)
+            checked = len(ranked)
+            if len(results) >= wanted or checked == len(scores):
+                return results[offset:wanted]
+            size *= OVERFETCH
+
+    def autocomplete(self, prefix, limit=8):
+        self.ensure_built()
+        pks = self.search(prefix, 0, limit)
+        with self.lock:
+            return [{'id': pk, 'name': self.names[pk]} for pk in pks if pk in self.names]
+
+class PostgresSearchEngine:
+    """Full-text search on the stored ``Product.search_vector`` column (GIN indexed)."""
+
+    def ensure_built(self):
+        pass
+
+    def rebuild(self):
+        Product.objects.update(search_vector=self.vector())
+
+    def vector(self):
+        return (SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('description', weight='B', config=SEARCH_CONFIG))
+
+    def index_product(self, product):
+        Product.objects.filter(pk=product.pk).update(search_vector=self.vector())
+
+    def index_products(self, pks):
+        Product.objects.filter(pk__in=pks).update(search_vector=self.vector())
+
+    def remove_product(self, pk):
+        pass
+
+    def query(self, text):
+        terms = tokenize(text, prefix=True)
+        if not terms:
+            return None
+        last = terms.pop()
+        if last not in STOP_WORDS:
+            terms.append(f'{last}:*')
+            return SearchQuery(' & '.join(terms), search_type='raw', config=SEARCH_CONFIG)
+        # The english config would drop a stop-word prefix, leaving nothing to match
+        prefix = SearchQuery(f'{last}:*', search_type='raw', config='simple')
+        if not terms:
+            return prefix
+        # As in MemorySearchIndex, a trailing stop word after other terms only boosts the rank
+        query = SearchQuery(' & '.join(terms), search_type='raw', config=SEARCH_CONFIG)
+        return query | (query & prefix)
+
+    def ranked(self, text):
+        query = self.query(text)
+        if query is None:
+            return Product.objects.none()
+        return (Product.objects.available().filter(search_vector=query)
+                .annotate(rank=SearchRank(F('search_vector'), query))
+                .order_by('-rank', '-pk'))
+
+    def search(self, query, offset=0, limit=24):
+        return list(self.ranked(query).values_list('pk', flat=True)[offset:offset + limit])
+
+    def autocomplete(self, prefix, limit=8):
+        return [{'id': pk, 'name': name} for pk, name in self.ranked(prefix).values_list('pk', 'name')[:limit]]
+
+memory_index = MemorySearchIndex()
+postgres_engine = PostgresSearchEngine()
+
+def get_search_engine():
+    return postgres_engine if connection.vendor == 'postgresql' else memory_index
+
+def create_search_index(sender, using='default', **kwargs):
+    # GIN indexes can't be declared in Meta.indexes without breaking SQLite
+    conn = connections[using]
+    if conn.vendor != 'postgresql':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS shop_product_search_gin '
+            'ON shop_product USING gin (search_vector)'
+        )
@@ -0,0 +1,24 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.db import transaction
+from django.dispatch import receiver
+from .models import Product
+from .search import get_search_engine
+from .caching import invalidate_products
+from .cart import merge_session_cart
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_engine().index_product(instance)
+        invalidate_products([instance.pk])
+        if instance.image and instance.renditions.get('source') != instance.image.name:
+            from .tasks import generate_product_renditions
+            transaction.on_commit(lambda: generate_product_renditions.delay(instance.pk))
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_engine().remove_product(instance.pk)
+    invalidate_products([instance.pk])
+
+user_logged_in.connect(merge_session_cart, dispatch_uid='shop_merge_session_cart')
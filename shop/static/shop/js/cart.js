@@ -1,9 +1,103 @@
 $(document).ready(function() {
-    $('.add-to-cart').click(function(e) {
+    // Cart changes go through the JSON cart API; the plain links stay as a no-JS fallback
+    function changeCart(pk, change) {
+        return $.ajax({
+            url: '/api/cart/items/' + pk + '/',
+            method: 'POST',
+            contentType: 'application/json',
+            data: JSON.stringify(change),
+            headers: {'X-CSRFToken': $('meta[name="csrf-token"]').attr('content')}
+        });
+    }
+
+    $(document).on('click', '.add-to-cart', function(e) {
         e.preventDefault();
-        var pk = $(this).data('pk');
-        $.post('/add_to_cart/' + pk + '/', function(data) {
+        changeCart($(this).data('pk'), {delta: 1}).done(function() {
             alert('Added to cart');
+        }).fail(function(xhr) {
+            alert((xhr.responseJSON && xhr.responseJSON.error) || 'Could not add to cart');
+        });
+    });
+
+    $('[data-cart-change]').click(function(e) {
+        e.preventDefault();
+        var $row = $(this).closest('[data-cart-line]');
+        var pk = $row.data('cart-line');
+        changeCart(pk, {delta: $(this).data('cart-change')}).done(function(cart) {
+            var line = cart.items.find(function(item) { return item.product_id === pk; });
+            if (!cart.items.length) {
+                window.location.reload();
+                return;
+            }
+            if (line) {
+                $row.find('[data-cart-quantity]').text(line.quantity);
+                $row.find('[data-cart-line-total]').text('$' + Number(line.line_total).toFixed(2));
+            } else {
+                $row.remove();
+            }
+            $('#cart-total').text(Number(cart.total).toFixed(2));
+        }).fail(function(xhr) {
+            alert((xhr.responseJSON && xhr.responseJSON.error) || 'Could not update cart');
         });
     });
-});
\ No newline at end of file
+
+    // Infinite scroll: fetch the next keyset page as JSON when "Load more" comes into view
+    var $grid = $('#product-grid');
+    var $loadMore = $('#load-more');
+    var loading = false;
+
+    function productCard(product) {
+        var $card = $('<div class="bg-white shadow-lg rounded-lg overflow-hidden hover:shadow-xl transition-shadow"></div>');
+        if (product.image) {
+            $('<img class="w-full h-48 object-cover" loading="lazy">').attr({src: product.image, alt: product.name}).appendTo($card);
+        } else {
+            $('<div class="w-full h-48 bg-gray-200 flex items-center justify-center text-gray-500">No Image</div>').appendTo($card);
+        }
+        var $body = $('<div class="p-4"></div>').appendTo($card);
+        $('<h3 class="text-xl font-semibold text-gray-800"></h3>').text(product.name).appendTo($body);
+        $('<p class="text-gray-600 mt-2 line-clamp-2"></p>').text(product.summary).appendTo($body);
+        $('<p class="text-2xl font-bold text-blue-600 mt-2"></p>').text('$' + product.price).appendTo($body);
+        var $actions = $('<div class="mt-4 flex space-x-2"></div>').appendTo($body);
+        $('<a class="btn-hover bg-blue-600 text-white px-4 py-2 rounded hover:bg-blue-700">View</a>').attr('href', product.url).appendTo($actions);
+        $('<a class="add-to-cart btn-hover bg-green-600 text-white px-4 py-2 rounded hover:bg-green-700">Add to Cart</a>').attr({href: product.add_to_cart_url, 'data-pk': product.id}).appendTo($actions);
+        return $card;
+    }
+
+    function loadNextPage() {
+        var cursor = $loadMore.data('next-cursor');
+        if (loading || !cursor) {
+            return;
+        }
+        loading = true;
+        var params = new URLSearchParams(window.location.search);
+        params.set('cursor', cursor);
+        params.set('format', 'json');
+        $.getJSON(window.location.pathname + '?' + params.toString(), function(data) {
+            $.each(data.products, function(i, product) {
+                $grid.append(productCard(product));
+            });
+            if (data.next_cursor) {
+                $loadMore.data('next-cursor', data.next_cursor);
+            } else {
+                $loadMore.parent().remove();
+                $loadMore = $();
+            }
+        }).always(function() {
+            loading = false;
+        });
+    }
+
+    if ($grid.length && $loadMore.length) {
+        $loadMore.click(function(e) {
+            e.preventDefault();
+            loadNextPage();
+        });
+        if ('IntersectionObserver' in window) {
+            new IntersectionObserver(function(entries) {
+                if (entries[0].isIntersecting) {
+                    loadNextPage();
+                }
+            }, {rootMargin: '400px'}).observe($loadMore[0]);
+        }
+    }
+});
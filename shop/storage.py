@@ -0,0 +1,52 @@
+import hashlib
+import os
+import posixpath
+import re
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name or ''))
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each distinct file once, named by the SHA-256 of its content.
+
+    ``products/ip16.jpg`` is saved as ``products/ab/<sha256>.jpg``. Saving
+    bytes that are already stored writes nothing and returns the existing
+    name, so re-uploads share one blob. A name never changes content, so
+    these files can be cached forever (see shop.views.serve_immutable).
+    Blobs may be shared, so they are never deleted on behalf of a single
+    product; dedupe_product_images --prune removes unreferenced ones.
+    """
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), hexdigest[:2], hexdigest + extension)
+        if self.exists(name):
+            return name
+        saved = super()._save(name, content)
+        if saved != name:
+            # Another upload of the same bytes won the race; keep its copy
+            self.delete(saved)
+        return name
+
+product_image_storage = ContentAddressedStorage()
+
+def walk(directory, storage=product_image_storage):
+    """Yield the name of every file under ``directory``, recursing into subdirectories."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in directories:
+        yield from walk(posixpath.join(directory, subdirectory), storage)
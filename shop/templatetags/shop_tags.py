@@ -1,4 +1,6 @@
 from django import template
+from django.utils.html import format_html
+from shop.images import SIZES, srcset
 
 register = template.Library()
 
@@ -7,4 +9,18 @@ def multiply(value, arg):
     try:
         return float(value) * float(arg)
     except (ValueError, TypeError):
-        return ''
\ No newline at end of file
+        return ''
+
+@register.simple_tag
+def product_image(product, size, css_class='', lazy=True):
+    """An <img>, or a <picture> with WebP and JPEG srcsets once renditions exist."""
+    loading = 'lazy' if lazy else 'eager'
+    if product.renditions.get('source') != product.image.name:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', product.image.url, product.name, css_class, loading)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        srcset(product, 'webp'), SIZES[size],
+        product.image.storage.url(product.renditions[size]['jpeg']), srcset(product, 'jpeg'), SIZES[size],
+        product.renditions[size]['width'], product.name, css_class, loading,
+    )
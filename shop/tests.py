@@ -0,0 +1,181 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import Address, CustomUser
+from .cart import DatabaseCart
+from .models import CartItem, Order, Product, StockReservation
+from .orders import OutOfStock, decrement_stock, place_order
+from .views import MAX_LINE_QUANTITY
+
+# Cart sizes each page is measured at; the query count must not grow with them
+CART_SIZES = [1, 5, 20]
+
+def delivery_form_data():
+    delivery = (timezone.now() + timedelta(days=2)).astimezone(ZoneInfo('Asia/Kolkata'))
+    return {
+        'street': '1 Main Road',
+        'city': 'Pune',
+        'state': 'MH',
+        'zip_code': '411001',
+        'country': 'India',
+        'preferred_delivery_time': delivery.strftime('%Y-%m-%dT%H:%M'),
+    }
+
+class CartQueryCountTests(TestCase):
+    def setUp(self):
+        # Availability counters live in the cache; start every test with cold counters
+        cache.clear()
+        self.user = CustomUser.objects.create_user('shopper', 'shopper@example.com', 'password', phone_number='+919000000001')
+        self.client.force_login(self.user)
+
+    def fill_cart(self, size):
+        # Start from an empty cart with no holds left over from a smaller one
+        CartItem.objects.all().delete()
+        StockReservation.objects.all().delete()
+        products = Product.objects.bulk_create(
+            Product(name=f'Product {i}', description='A product', price=Decimal('2.50'), stock=100)
+            for i in range(size)
+        )
+        CartItem.objects.bulk_create(CartItem(user=self.user, product=product, quantity=2) for product in products)
+
+    def test_cart(self):
+        for size in CART_SIZES:
+            with self.subTest(size=size):
+                self.fill_cart(size)
+                with self.assertNumQueries(2):
+                    response = self.client.get(reverse('cart'))
+                self.assertEqual(len(response.context['cart_items']), size)
+
+    def test_checkout_get(self):
+        for size in CART_SIZES:
+            with self.subTest(size=size):
+                cache.clear()
+                self.fill_cart(size)
+                with self.assertNumQueries(8):
+                    response = self.client.get(reverse('checkout'))
+                self.assertEqual(response.status_code, 200)
+
+    def test_checkout_post(self):
+        for size in CART_SIZES:
+            with self.subTest(size=size):
+                cache.clear()
+                self.fill_cart(size)
+                with self.assertNumQueries(21):
+                    response = self.client.post(reverse('checkout'), delivery_form_data())
+                self.assertEqual(response.status_code, 302)
+                self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+class CartApiTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Mug', description='A product', price=Decimal('3.00'), stock=500)
+        self.url = reverse('cart_item_api', args=[self.product.pk])
+
+    def post(self, payload):
+        return self.client.post(self.url, payload, content_type='application/json')
+
+    def test_rejects_non_object_body(self):
+        self.assertEqual(self.post([1, 2]).status_code, 400)
+
+    def test_line_quantity_is_capped(self):
+        self.assertEqual(self.post({'delta': MAX_LINE_QUANTITY}).status_code, 200)
+        self.assertEqual(self.post({'delta': MAX_LINE_QUANTITY}).status_code, 400)
+        self.assertEqual(self.post({'quantity': MAX_LINE_QUANTITY + 1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('cart_api')).json()['items'][0]['quantity'], MAX_LINE_QUANTITY)
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password', phone_number='+919000000002')
+        self.address = Address.objects.create(user=self.user, street='1 Main Road', city='Pune', state='MH', zip_code='411001', country='India')
+        self.product = Product.objects.create(name='Lamp', description='A product', price=Decimal('5.00'), stock=5)
+
+    def place_order(self):
+        return place_order(self.user, DatabaseCart(self.user), self.address, timezone.now() + timedelta(days=2))
+
+    def test_retired_product(self):
+        CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        with self.assertRaises(OutOfStock):
+            self.place_order()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_keeps_holds_on_other_products(self):
+        other = Product.objects.create(name='Shade', description='A product', price=Decimal('2.00'), stock=5)
+        StockReservation.objects.create(user=self.user, product=other, quantity=1, expires_at=timezone.now() + timedelta(minutes=5))
+        CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        self.place_order()
+        self.assertEqual(list(StockReservation.objects.values_list('product', flat=True)), [other.pk])
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Shoppers racing for the last units; run against PostgreSQL for real row locking."""
+    shoppers = 8
+    stock = 3
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Last few', description='A product', price=Decimal('5.00'), stock=self.stock)
+        self.users = []
+        for i in range(self.shoppers):
+            user = CustomUser.objects.create_user(f'racer{i}', f'racer{i}@example.com', 'password', phone_number=f'+9190000001{i:02d}')
+            CartItem.objects.create(user=user, product=self.product, quantity=1)
+            self.users.append(user)
+
+    def race(self, checkout):
+        """Run ``checkout(user)`` in one thread per shopper, all released together."""
+        barrier = threading.Barrier(self.shoppers)
+        outcomes = []
+
+        def run(user):
+            try:
+                barrier.wait()
+                checkout(user)
+                outcomes.append('ordered')
+            except OutOfStock:
+                outcomes.append('out of stock')
+            except OperationalError:
+                # SQLite refuses concurrent writers instead of queueing them
+                outcomes.append('locked')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def assertNoOversell(self, outcomes):
+        self.assertEqual(len(outcomes), self.shoppers)
+        self.product.refresh_from_db()
+        sold = self.stock - self.product.stock
+        self.assertGreaterEqual(self.product.stock, 0)
+        self.assertEqual(outcomes.count('ordered'), sold)
+        if connection.vendor != 'sqlite':
+            self.assertEqual(sold, self.stock)
+
+    def test_place_order(self):
+        delivery = timezone.now() + timedelta(days=2)
+
+        def checkout(user):
+            address = Address.objects.create(user=user, street='1 Main Road', city='Pune', state='MH', zip_code='411001', country='India')
+            place_order(user, DatabaseCart(user), address, delivery)
+
+        outcomes = self.race(checkout)
+        self.assertNoOversell(outcomes)
+        self.assertEqual(Order.objects.count(), outcomes.count('ordered'))
+
+    def test_decrement_stock(self):
+        # Skips the availability counters, so every shopper reaches the UPDATE
+        def checkout(user):
+            with transaction.atomic():
+                decrement_stock({self.product: 1}, user)
+
+        self.assertNoOversell(self.race(checkout))
@@ -7,9 +7,15 @@ urlpatterns = [
     path('add_to_cart/<int:pk>/', views.add_to_cart, name='add_to_cart'),
     path('cart/', views.cart, name='cart'),
     path('update_cart_quantity/<int:pk>/<str:action>/', views.update_cart_quantity, name='update_cart_quantity'),
+    path('api/cart/', views.cart_api, name='cart_api'),
+    path('api/cart/items/<int:pk>/', views.cart_item_api, name='cart_item_api'),
     path('checkout/', views.checkout, name='checkout'),
     path('payment/', views.payment, name='payment'),
     path('order_success/<str:order_id>/', views.order_success, name='order_success'),
     path('return_request/<str:order_id>/', views.return_request, name='return_request'),
     path('search/', views.search, name='search'),
+    path('search/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
+    path('cache/stats/', views.cache_statistics, name='cache_statistics'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('dashboard/sales/', views.sales_dashboard, name='sales_dashboard'),
 ]
\ No newline at end of file
@@ -1,124 +1,203 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.urls import reverse
+from django.views.static import serve
+from django.conf import settings
+from django.db import transaction
+from asgiref.sync import sync_to_async
+from django.db.models.functions import Substr
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from .models import Product, CartItem, Order, OrderItem, ReturnRequest
+from .models import Product, Order, ReturnRequest
+from .recommend import recommend_products
+from .pagination import keyset_page
+from .search import get_search_engine
+from .cart import get_cart
+from .orders import OutOfStock, place_order
+from .reservations import reserve_cart
+from .mail import queue_mail
+from .profiling import render_prometheus
+from .images import rendition_url
+from .rollups import sales_summary
+from .caching import LISTING_TTL, PRODUCT_TTL, attach_versions, cache_stats, cached, catalog_version, product_versions
 from accounts.models import Address
 from accounts.forms import AddressForm, DeliveryTimeForm, ReturnRequestForm
-from django.core.mail import send_mail
-from django.conf import settings
-import uuid
-from datetime import datetime
+import hashlib
+import json
+from datetime import datetime, timedelta
 from django.utils import timezone
-from celery import shared_task
-
-@shared_task
-def send_delivery_notification(order_id):
-    order = Order.objects.get(order_id=order_id)
-    if timezone.now() >= order.preferred_delivery_time:
-        send_mail(
-            'Your Order is Out for Delivery',
-            f'Order {order.order_id} is out for delivery to {order.address}.',
-            settings.EMAIL_HOST_USER,
-            [order.user.email],
-            fail_silently=False,
-        )
 
-@login_required
+PAGE_SIZE = 24
+SUMMARY_LENGTH = 160
+DASHBOARD_PERIODS = [7, 30, 90, 365]
+# Largest quantity the cart API lets one line reach, and the largest change it accepts at once
+MAX_LINE_QUANTITY = 99
+
+def listing_queryset():
+    # Cards only need a short excerpt, never the full description text
+    return Product.objects.available().only('id', 'name', 'price', 'image', 'renditions', 'created_at').annotate(
+        summary=Substr('description', 1, SUMMARY_LENGTH)
+    )
+
+def product_card_data(product):
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'summary': product.summary,
+        'price': str(product.price),
+        'image': rendition_url(product, 'card'),
+        'url': reverse('product_detail', args=[product.pk]),
+        'add_to_cart_url': reverse('add_to_cart', args=[product.pk]),
+    }
+
+def listing_response(request, products, next_cursor, template, context):
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'products': [product_card_data(product) for product in products],
+            'next_cursor': next_cursor,
+        })
+    context.update({'products': attach_versions(products), 'next_cursor': next_cursor})
+    return render(request, template, context)
+
 def home(request):
-    products = Product.objects.all()
-    recommendations = Product.objects.order_by('?')[:4]
-    return render(request, 'shop/home.html', {'products': products, 'recommendations': recommendations})
+    context = {}
+    if request.GET.get('format') != 'json':
+        context['recommendations'] = recommend_products(request.user, 4)
+    cursor = request.GET.get('cursor') or ''
+    products, next_cursor = cached(
+        'listing', f'home:{catalog_version()}:{cursor}',
+        lambda: keyset_page(listing_queryset(), cursor, PAGE_SIZE), LISTING_TTL,
+    )
+    return listing_response(request, products, next_cursor, 'shop/home.html', context)
 
-@login_required
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
-    return render(request, 'shop/product_detail.html', {'product': product})
+    version = product_versions([pk])[pk]
+    product = cached('product', f'{pk}:{version}', lambda: Product.objects.filter(pk=pk).first(), PRODUCT_TTL)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    return render(request, 'shop/product_detail.html', {'product': product, 'cache_version': version})
 
-@login_required
 def add_to_cart(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    cart_item, created = CartItem.objects.get_or_create(user=request.user, product=product)
-    if not created:
-        cart_item.quantity += 1
-    cart_item.save()
+    if not product.in_stock:
+        messages.error(request, f'{product.name} is out of stock.')
+        return redirect('product_detail', pk=pk)
+    get_cart(request).add(product.pk)
     messages.success(request, f'{product.name} added to cart.')
     return redirect('cart')
 
-@login_required
 def cart(request):
-    cart_items = CartItem.objects.filter(user=request.user)
-    total = sum(item.product.price * item.quantity for item in cart_items)
-    return render(request, 'shop/cart.html', {'cart_items': cart_items, 'total': total})
+    cart = get_cart(request)
+    return render(request, 'shop/cart.html', {'cart_items': cart, 'total': cart.total})
 
-@login_required
 def update_cart_quantity(request, pk, action):
-    cart_item = get_object_or_404(CartItem, pk=pk, user=request.user)
+    cart = get_cart(request)
+    if not cart.quantity(pk):
+        raise Http404('No such item in your cart.')
     if action == 'increase':
-        cart_item.quantity += 1
+        cart.add(pk)
     elif action == 'decrease':
-        cart_item.quantity -= 1
-        if cart_item.quantity <= 0:
-            cart_item.delete()
+        cart.add(pk, -1)
+        if not cart.quantity(pk):
             messages.success(request, 'Item removed from cart.')
-            return redirect('cart')
-    cart_item.save()
     return redirect('cart')
 
+def bounded(value, low, high):
+    value = int(value)
+    if not low <= value <= high:
+        raise ValueError(f'{value} is outside {low}..{high}')
+    return value
+
+def change_cart(request, pk, payload):
+    if not isinstance(payload, dict):
+        raise TypeError('Expected a JSON object')
+    cart = get_cart(request)
+    if 'quantity' in payload:
+        quantity = bounded(payload['quantity'], 0, MAX_LINE_QUANTITY)
+        delta = quantity - cart.quantity(pk)
+    else:
+        delta = bounded(payload.get('delta', 1), -MAX_LINE_QUANTITY, MAX_LINE_QUANTITY)
+        bounded(cart.quantity(pk) + delta, -MAX_LINE_QUANTITY, MAX_LINE_QUANTITY)
+    if delta > 0 and not Product.objects.available().filter(pk=pk).exists():
+        return None
+    if 'quantity' in payload:
+        cart.set(pk, quantity)
+    elif delta:
+        cart.add(pk, delta)
+    return cart.summary()
+
+async def cart_api(request):
+    """JSON view of the cart: its lines, item count and total."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    summary = await sync_to_async(lambda: get_cart(request).summary())()
+    return JsonResponse(summary)
+
+async def cart_item_api(request, pk):
+    """Change one cart line and return the recomputed cart.
+
+    POST a JSON object with either ``delta`` (a signed increment, default 1)
+    or an absolute ``quantity``, each at most MAX_LINE_QUANTITY in size;
+    zero removes the line. The cart work runs in
+    one sync thread so its single-statement updates keep their transaction.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        payload = json.loads(request.body or b'{}')
+        summary = await sync_to_async(change_cart)(request, pk, payload)
+    except (ValueError, TypeError):
+        return JsonResponse({'error': f'Expected a JSON object with an integer delta or quantity of at most {MAX_LINE_QUANTITY}.'}, status=400)
+    if summary is None:
+        return JsonResponse({'error': 'This product is out of stock.'}, status=409)
+    return JsonResponse(summary)
+
 @login_required
 def checkout(request):
-    cart_items = CartItem.objects.filter(user=request.user)
+    cart_items = get_cart(request)
     if not cart_items:
         messages.error(request, 'Your cart is empty.')
         return redirect('cart')
 
-    for item in cart_items:
-        if item.quantity > item.product.stock:
-            messages.error(request, f'{item.product.name} is out of stock.')
-            recommendations = Product.objects.exclude(pk=item.product.pk).order_by('?')[:4]
-            return render(request, 'shop/out_of_stock.html', {'product': item.product, 'recommendations': recommendations})
-
     if request.method == 'POST':
         address_form = AddressForm(request.user, request.POST)
         delivery_form = DeliveryTimeForm(request.POST)
         if address_form.is_valid() and delivery_form.is_valid():
-            if address_form.cleaned_data['use_existing'] and address_form.cleaned_data['existing_address']:
-                address = address_form.cleaned_data['existing_address']
-            else:
-                address = address_form.save(commit=False)
-                address.user = request.user
-                address.save()
-
-            total_amount = sum(item.product.price * item.quantity for item in cart_items)
-            order = Order.objects.create(
-                user=request.user,
-                order_id=str(uuid.uuid4()),
-                address=address,
-                preferred_delivery_time=delivery_form.cleaned_data['preferred_delivery_time'],
-                payment_method='Pending',
-                total_amount=total_amount,
-                status='confirmed'
-            )
-
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.price
-                )
-                item.product.stock -= item.quantity
-                if item.product.stock <= 0:
-                    item.product.delete()
-                else:
-                    item.product.save()
-                item.delete()
+            try:
+                with transaction.atomic():
+                    if address_form.cleaned_data['use_existing'] and address_form.cleaned_data['existing_address']:
+                        address = address_form.cleaned_data['existing_address']
+                    else:
+                        address = address_form.save(commit=False)
+                        address.user = request.user
+                        address.save()
+                    order = place_order(
+                        request.user,
+                        cart_items,
+                        address,
+                        delivery_form.cleaned_data['preferred_delivery_time'],
+                    )
+            except OutOfStock as e:
+                # The hold expired and another checkout took the remaining stock
+                messages.error(request, str(e))
+                recommendations = recommend_products(request.user, 4, related_to=e.product.pk)
+                return render(request, 'shop/out_of_stock.html', {'product': e.product, 'recommendations': recommendations})
 
+            cart_items.clear()
             request.session['order_id'] = order.order_id
             return redirect('payment')
         else:
             # Log form errors for debugging
             print(address_form.errors, delivery_form.errors)
     else:
+        # Hold the stock while the customer fills in the checkout form
+        try:
+            reserve_cart(request.user, cart_items)
+        except OutOfStock as e:
+            messages.error(request, str(e))
+            recommendations = recommend_products(request.user, 4, related_to=e.product.pk)
+            return render(request, 'shop/out_of_stock.html', {'product': e.product, 'recommendations': recommendations})
         address_form = AddressForm(user=request.user)
         delivery_form = DeliveryTimeForm()
 
@@ -141,7 +220,6 @@ def payment(request):
         order.payment_method = payment_method
         order.status = 'Confirmed'
         order.save()
-        send_delivery_notification.delay(order.order_id)
         messages.success(request, 'Order placed successfully!')
         return redirect('order_success', order_id=order.order_id)
     
@@ -162,12 +240,10 @@ def return_request(request, order_id):
             return_request = form.save(commit=False)
             return_request.order = order
             return_request.save()
-            send_mail(
+            queue_mail(
                 'Return Request Submitted',
                 f'Your return request for Order {order.order_id} has been submitted. Description: {return_request.description}',
-                settings.EMAIL_HOST_USER,
                 [order.user.email],
-                fail_silently=False,
             )
             messages.success(request, 'Return request submitted.')
             return redirect('profile')
@@ -175,8 +251,61 @@ def return_request(request, order_id):
         form = ReturnRequestForm()
     return render(request, 'shop/return_request.html', {'form': form, 'order': order})
 
-@login_required
 def search(request):
-    query = request.GET.get('q', '')
-    products = Product.objects.filter(name__icontains=query) if query else Product.objects.all()
-    return render(request, 'shop/search.html', {'products': products, 'query': query})
\ No newline at end of file
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor') or ''
+    key = f'search:{catalog_version()}:{hashlib.md5(query.encode()).hexdigest()}:{cursor}'
+    products, next_cursor = cached('listing', key, lambda: search_page(query, cursor), LISTING_TTL)
+    return listing_response(request, products, next_cursor, 'shop/search.html', {'query': query})
+
+def search_page(query, cursor):
+    if not query:
+        return keyset_page(listing_queryset(), cursor, PAGE_SIZE)
+    # Ranked results page by offset; the engine only returns one page of ids
+    offset = int(cursor) if cursor.isdigit() else 0
+    ids = get_search_engine().search(query, offset=offset, limit=PAGE_SIZE + 1)
+    found = listing_queryset().in_bulk(ids[:PAGE_SIZE])
+    products = [found[pk] for pk in ids[:PAGE_SIZE] if pk in found]
+    next_cursor = str(offset + PAGE_SIZE) if len(ids) > PAGE_SIZE else None
+    return products, next_cursor
+
+def search_autocomplete(request):
+    prefix = request.GET.get('q', '').strip()
+    suggestions = get_search_engine().autocomplete(prefix) if prefix else []
+    return JsonResponse({'suggestions': suggestions})
+
+@staff_member_required
+def cache_statistics(request):
+    return JsonResponse(cache_stats())
+
+@staff_member_required
+def metrics(request):
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4')
+
+@staff_member_required
+def sales_dashboard(request):
+    # Reads ProductDailySales only, never the order tables
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except ValueError:
+        days = 30
+    last = timezone.localdate()
+    first = last - timedelta(days=days - 1)
+    daily, products = sales_summary(first, last)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'first': first, 'last': last, 'daily': daily, 'products': products})
+    totals = {
+        'units': sum(row['units'] for row in daily),
+        'revenue': sum(row['revenue'] for row in daily),
+        'returned_units': sum(row['returned_units'] for row in daily),
+        'returned_value': sum(row['returned_value'] for row in daily),
+    }
+    return render(request, 'shop/sales_dashboard.html', {
+        'days': days, 'periods': DASHBOARD_PERIODS, 'first': first, 'last': last, 'daily': daily, 'products': products, 'totals': totals,
+    })
+
+def serve_immutable(request, path):
+    # Content-addressed files never change under the same name, so clients and CDNs may keep them forever
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response